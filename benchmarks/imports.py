@@ -0,0 +1,83 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from synthetic_pdf import generate_ordkort, generate_ordlista  # noqa: E402
+
+
+# Runs the CLI entry points under -X importtime on synthetic PDFs and reports how long their imports take and which
+# heavy packages each mode pulls in. Modes that don't need a package must not import it.
+
+
+HEAVY = ['deep_translator', 'requests', 'urllib.request', 'genanki', 'pdfminer.layout', 'pdfminer.pdfinterp']
+
+# script, arguments, packages the mode must not import
+MODES = [
+    ('ordlista.py', ['--pairs-only'], ['genanki', 'deep_translator', 'requests']),
+    ('ordlista.py', [], ['deep_translator', 'requests']),
+    ('ordkort.py', ['--pairs-only'], ['genanki', 'deep_translator', 'requests', 'urllib.request']),
+    ('ordkort.py', ['--no-translate'], ['genanki', 'deep_translator', 'requests', 'urllib.request']),
+    ('ordkort.py', ['--backend', 'noop', '--no-cache'], ['deep_translator', 'requests']),
+]
+
+
+def _imports(stderr):
+    # module -> cumulative microseconds, and the total of the top level imports
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return modules, total
+
+
+def run_mode(script, arguments, directory, parse_cache):
+    command = [sys.executable, '-X', 'importtime', str(ROOT / 'src' / script), *arguments]
+    if not parse_cache:
+        command.append('--no-parse-cache')
+
+    result = subprocess.run(command, cwd=directory, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+    if result.returncode:
+        raise Exception(f'{script} {" ".join(arguments)} failed:\n{result.stderr[-2000:]}')
+    return _imports(result.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=4, help='pages per synthetic PDF')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ['ordlista_a1a2.pdf', 'ordlista_b1b2.pdf']:
+            generate_ordlista(Path(directory) / name, args.pages)
+        for name in ['ordkort_b1b2.pdf', 'ordkort_b2c1.pdf']:
+            generate_ordkort(Path(directory) / name, args.pages)
+
+        for parse_cache in (False, True):
+            print('warm parse cache' if parse_cache else 'no parse cache')
+            for script, arguments, forbidden in MODES:
+                if parse_cache:
+                    # fills the parse cache, only the run hitting it is measured
+                    run_mode(script, arguments, directory, parse_cache)
+                modules, total = run_mode(script, arguments, directory, parse_cache)
+                loaded = [m for m in HEAVY if m in modules]
+                unexpected = [m for m in forbidden if m in modules]
+                failed |= bool(unexpected)
+
+                label = f'{script} {" ".join(arguments)}'
+                print(f'  {label:<40} {total / 1000:8.1f}ms  {", ".join(loaded) or "-"}'
+                      + (f'  UNEXPECTED: {", ".join(unexpected)}' if unexpected else ''))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,94 @@
+import html
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import genanki
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from deck_writer import write_package  # noqa: E402
+from ordlista.deck_creator import SwedishNote, my_model  # noqa: E402
+
+
+# notes/second of the bulk package writer compared with genanki, and a check that both packages hold the same rows
+
+
+def _make_notes(count, seed=0):
+    rnd = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyzåäö'
+    notes = []
+
+    for i in range(count):
+        swedish = ''.join(rnd.choice(letters) for _ in range(rnd.randint(3, 12))) + str(i)
+        english = ''.join(rnd.choice(letters) for _ in range(rnd.randint(3, 12)))
+        chapter = str(rnd.randint(1, 20))
+        notes.append(SwedishNote(model=my_model, fields=[html.escape(swedish), '', html.escape(english), chapter, ''],
+                                 tags=[f'Kapitel{chapter}']))
+
+    return notes
+
+
+def _genanki(deck, notes, output, timestamp):
+    for note in notes:
+        deck.add_note(note)
+    genanki.Package(deck).write_to_file(output, timestamp)
+
+
+def _bulk(deck, notes, output, timestamp):
+    write_package([(deck, notes)], output, timestamp)
+
+
+def _collection(file, directory):
+    with zipfile.ZipFile(file) as f:
+        return sqlite3.connect(f.extract('collection.anki2', directory))
+
+
+def _compare(a, b, directory):
+    a = _collection(a, Path(directory) / 'a')
+    b = _collection(b, Path(directory) / 'b')
+
+    queries = [
+        'SELECT type, name, sql FROM sqlite_master ORDER BY name',
+        'SELECT id, guid, mid, mod, usn, tags, flds, sfld, csum, flags, data FROM notes ORDER BY id',
+        'SELECT * FROM cards ORDER BY id',
+        'SELECT decks, dconf, conf FROM col',
+    ]
+    for query in queries:
+        if a.execute(query).fetchall() != b.execute(query).fetchall():
+            return query
+
+    return None
+
+
+def _seconds(write, notes, output, timestamp, repeat):
+    best = float('inf')
+
+    for _ in range(repeat):
+        deck = genanki.Deck(1234567890, 'Benchmark')
+        start = time.perf_counter()
+        write(deck, notes, output, timestamp)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == '__main__':
+    timestamp = 1700000000.0
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (1000, 10000, 50000):
+            notes = _make_notes(count)
+            a = Path(directory) / f'genanki_{count}.apkg'
+            b = Path(directory) / f'bulk_{count}.apkg'
+
+            before = _seconds(_genanki, notes, a, timestamp, 1)
+            after = _seconds(_bulk, notes, b, timestamp, 3)
+
+            mismatch = _compare(a, b, Path(directory) / str(count))
+            print(f'{count} notes: genanki {count / before:,.0f} notes/s, bulk {count / after:,.0f} notes/s '
+                  f'({before / after:.2f}x), ' + ('identical rows' if mismatch is None else f'differs in: {mismatch}'))
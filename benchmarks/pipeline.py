@@ -0,0 +1,147 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import genanki
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from ordkort.backends import NoopBackend  # noqa: E402
+from ordkort.deck_creator import build_deck as build_ordkort_deck  # noqa: E402
+from ordkort.process_pdf import get_pairs as get_ordkort_pairs  # noqa: E402
+from ordkort.translate import TranslationEngine  # noqa: E402
+from ordlista.deck_creator import build_deck as build_ordlista_deck  # noqa: E402
+from ordlista.process_pdf import get_pairs as get_ordlista_pairs  # noqa: E402
+from deck_writer import write_package  # noqa: E402
+from profiler import PROFILER  # noqa: E402
+from synthetic_pdf import generate_ordkort, generate_ordlista  # noqa: E402
+
+
+# Times every pipeline stage and deck writing on synthetic PDFs of several sizes and stores the results as JSON, so
+# runs on different commits can be compared with --compare.
+
+
+SIZES = [8, 32, 128]
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stages():
+    return {name: {'items': s['items'], 'wall': s['wall'], 'self_wall': s['self_wall'], 'self_cpu': s['self_cpu']}
+            for name, s in PROFILER.report()['stages'].items()}
+
+
+def _write(decks, directory, name):
+    # genanki against the bulk writer, on the same notes
+    start = time.perf_counter()
+    package = genanki.Package([deck for deck, notes in decks])
+    for deck, notes in decks:
+        for note in notes:
+            deck.add_note(note)
+    package.write_to_file(Path(directory) / f'{name}_genanki.apkg')
+    genanki_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    write_package(decks, Path(directory) / f'{name}_bulk.apkg')
+    bulk_seconds = time.perf_counter() - start
+
+    return {'notes': sum(len(notes) for deck, notes in decks), 'genanki': genanki_seconds, 'bulk': bulk_seconds}
+
+
+def run_size(pages, directory, extraction):
+    ordlista = Path(directory) / f'ordlista_{pages}.pdf'
+    ordkort = Path(directory) / f'ordkort_{pages}.pdf'
+    generate_ordlista(ordlista, pages)
+    generate_ordkort(ordkort, pages)
+
+    PROFILER.enable(memory=False)
+    start = time.perf_counter()
+    ordlista_pairs = get_ordlista_pairs(ordlista, extraction=extraction)
+    ordlista_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ordkort_pairs = get_ordkort_pairs(ordkort, engine=TranslationEngine(NoopBackend()), extraction=extraction)
+    ordkort_seconds = time.perf_counter() - start
+
+    ordlista_deck = build_ordlista_deck(f'Benchmark ordlista {pages}', ordlista_pairs)
+    ordkort_deck = build_ordkort_deck(f'Benchmark ordkort {pages}', ordkort_pairs)
+    stages = _stages()
+    PROFILER.disable()
+
+    # the journal written next to the PDF isn't part of the benchmark
+    ordkort.with_suffix('.journal').unlink(missing_ok=True)
+
+    return {
+        'pages': pages,
+        'ordlista': {'pairs': len(ordlista_pairs), 'seconds': ordlista_seconds},
+        'ordkort': {'pairs': len(ordkort_pairs), 'seconds': ordkort_seconds},
+        'stages': stages,
+        'write': _write([ordlista_deck, ordkort_deck], directory, f'decks_{pages}'),
+    }
+
+
+def compare(old, new):
+    old_sizes = {run['pages']: run for run in old['runs']}
+
+    for run in new['runs']:
+        before = old_sizes.get(run['pages'])
+        if before is None:
+            continue
+
+        print(f'{run["pages"]} pages ({old["commit"]} -> {new["commit"]})')
+        rows = [(f'{kind}', before[kind]['seconds'], run[kind]['seconds']) for kind in ('ordlista', 'ordkort')]
+        rows += [(f'  {name}', before['stages'][name]['self_wall'], stage['self_wall'])
+                 for name, stage in run['stages'].items() if name in before['stages']]
+        rows += [(f'write {writer}', before['write'][writer], run['write'][writer]) for writer in ('genanki', 'bulk')]
+
+        for name, a, b in rows:
+            print(f'  {name:<40} {a:8.3f}s {b:8.3f}s {b / a if a else float("inf"):6.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='*', default=SIZES, help='pages per synthetic PDF')
+    parser.add_argument('--extraction', choices=['layout', 'fast'], default='layout')
+    parser.add_argument('--output', help='results file, defaults to benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', metavar='FILE', help='earlier results to compare with')
+    args = parser.parse_args()
+
+    commit = _commit()
+    results = {
+        'commit': commit,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'extraction': args.extraction,
+        'runs': [],
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in args.sizes:
+            run = run_size(pages, directory, args.extraction)
+            results['runs'].append(run)
+            print(f'{pages} pages: ordlista {run["ordlista"]["pairs"]} pairs in {run["ordlista"]["seconds"]:.2f}s, '
+                  f'ordkort {run["ordkort"]["pairs"]} pairs in {run["ordkort"]["seconds"]:.2f}s, '
+                  f'{run["write"]["notes"]} notes written in {run["write"]["genanki"]:.2f}s (genanki) / '
+                  f'{run["write"]["bulk"]:.2f}s (bulk)')
+
+    output = Path(args.output) if args.output else ROOT / 'benchmarks' / 'results' / f'{commit or "local"}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
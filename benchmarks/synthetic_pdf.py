@@ -0,0 +1,179 @@
+import argparse
+import random
+import zlib
+
+
+# Synthetic PDFs laid out like the Rivstart volumes, the real ones can't be committed. The ordlista has Kapitel and
+# Sidan markers, Swedish in MyriadPro-Regular followed by English in MyriadPro-It on the same line, conjugations in
+# brackets, two-liners and page numbers. The ordkort has 16pt MyriadPro cards under 18pt bold chapter and text
+# headers. Both scale to any number of pages.
+
+
+_WORDS = ['hus', 'bil', 'katt', 'hund', 'skola', 'bok', 'lärare', 'väg', 'stad', 'sjö', 'fjäll', 'ö', 'äpple',
+          'arbete', 'fönster', 'dörr', 'kök', 'säng', 'gata', 'tåg', 'flygplats', 'kaffe', 'bröd', 'smör']
+_ENGLISH = ['house', 'car', 'cat', 'dog', 'school', 'book', 'teacher', 'road', 'city', 'lake', 'mountain',
+            'island', 'apple', 'work', 'window', 'door', 'kitchen', 'bed', 'street', 'train', 'airport',
+            'coffee', 'bread', 'butter']
+_TEXTS = ['Hemma', 'Att resa', 'På jobbet', 'Mat och dryck', 'Natur']
+
+_CHAR_WIDTH = 500
+
+
+def _escape(text):
+    raw = text.encode('cp1252')
+    return raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _text_width(text, size):
+    return len(text) * _CHAR_WIDTH * size / 1000
+
+
+class _Page:
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, font, size, text):
+        self.ops.append(b'BT /%s %d Tf %.2f %.2f Td (%s) Tj ET' % (font.encode(), size, x, y, _escape(text)))
+
+
+def _write_pdf(pages, fonts, output):
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font_refs = {}
+    for alias, name in fonts.items():
+        widths = b' '.join(b'%d' % _CHAR_WIDTH for _ in range(32, 256))
+        descriptor = add(b'<< /Type /FontDescriptor /FontName /%s /Flags 32 /FontBBox [0 -200 1000 800] '
+                         b'/ItalicAngle 0 /Ascent 800 /Descent -200 /CapHeight 700 /StemV 80 >>' % name.encode())
+        font_refs[alias] = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /FirstChar 32 /LastChar 255 '
+                               b'/Widths [%s] /Encoding /WinAnsiEncoding /FontDescriptor %d 0 R >>'
+                               % (name.encode(), widths, descriptor))
+
+    resources = b'<< /Font << %s >> >>' % b' '.join(b'/%s %d 0 R' % (a.encode(), r) for a, r in font_refs.items())
+
+    pages_ref = len(objects) + 2 * len(pages) + 1
+    page_refs = []
+    for page in pages:
+        content = zlib.compress(b'\n'.join(page.ops))
+        content_ref = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content))
+        page_refs.append(add(b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Resources %s '
+                             b'/Contents %d 0 R >>' % (pages_ref, resources, content_ref)))
+
+    add(b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % r for r in page_refs), len(pages)))
+    catalog_ref = add(b'<< /Type /Catalog /Pages %d 0 R >>' % pages_ref)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for i, body in enumerate(objects):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (i + 1, body)
+
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, catalog_ref, xref)
+
+    with open(output, 'wb') as f:
+        f.write(out)
+
+
+def generate_ordlista(output, pages=4, lines_per_page=30, seed=0):
+    rnd = random.Random(seed)
+    fonts = {'F1': 'ABCDEF+MyriadPro-Bold', 'F2': 'ABCDEF+MyriadPro-Regular', 'F3': 'ABCDEF+MyriadPro-It'}
+    out_pages = []
+    chapter = 0
+    page_number = 10
+
+    for p in range(pages):
+        page = _Page()
+        y = 800
+
+        if p % 2 == 0 and chapter < 18:
+            chapter += 1
+            page.text(50, y, 'F1', 14, f'Kapitel {chapter}')
+            y -= 24
+
+        page_number += rnd.randint(1, 3)
+        page.text(50, y, 'F1', 11, f'Sidan {page_number}')
+        y -= 18
+
+        for i in range(lines_per_page):
+            swedish = rnd.choice(_WORDS)
+            english = _ENGLISH[_WORDS.index(swedish)]
+            kind = rnd.random()
+
+            if kind < 0.2:
+                # conjugated verb, conjugation follows the headword in brackets
+                swedish = f'{swedish} ({swedish}r, {swedish}de, {swedish}t)'
+                page.text(50, y, 'F2', 10, swedish)
+                x = 50 + _text_width(swedish, 10) + 6
+            elif kind < 0.3 and y > 100:
+                # two-liner, the English part wraps onto the next line
+                head = f'{swedish} och {rnd.choice(_WORDS)}'
+                page.text(50, y, 'F2', 10, head)
+                page.text(50 + _text_width(head, 10) + 6, y, 'F3', 10, f'{english} and')
+                y -= 12
+                page.text(50, y, 'F3', 10, rnd.choice(_ENGLISH))
+                y -= 12
+                continue
+            else:
+                page.text(50, y, 'F2', 10, swedish)
+                x = 50 + _text_width(swedish, 10) + 6
+
+            page.text(x, y, 'F3', 10, english)
+            y -= 12
+
+            if y < 60:
+                break
+
+        page.text(290, 30, 'F2', 9, str(page_number))
+        out_pages.append(page)
+
+    _write_pdf(out_pages, fonts, output)
+
+
+def generate_ordkort(output, pages=4, cards_per_page=20, seed=0):
+    rnd = random.Random(seed)
+    fonts = {'F1': 'ABCDEF+MyriadPro-Regular', 'F2': 'ABCDEF+MyriadPro-Bold', 'F3': 'ABCDEF+AGaramondPro-Regular'}
+    out_pages = []
+    chapter = 0
+
+    for p in range(pages):
+        page = _Page()
+        y = 800
+
+        if p % 2 == 0 and chapter < 18:
+            chapter += 1
+            page.text(50, y, 'F2', 18, str(chapter))
+            y -= 30
+            page.text(50, y, 'F2', 18, rnd.choice(_TEXTS))
+            y -= 30
+
+        for i in range(cards_per_page):
+            page.text(50, y, 'F1', 16, f'{rnd.choice(["en", "ett", "att"])} {rnd.choice(_WORDS)}')
+            y -= 32
+            if y < 60:
+                break
+
+        page.text(290, 30, 'F3', 9, str(p + 1))
+        out_pages.append(page)
+
+    _write_pdf(out_pages, fonts, output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('kind', choices=['ordlista', 'ordkort'])
+    parser.add_argument('output')
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.kind == 'ordlista':
+        generate_ordlista(args.output, args.pages, seed=args.seed)
+    else:
+        generate_ordkort(args.output, args.pages, seed=args.seed)
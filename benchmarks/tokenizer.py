@@ -0,0 +1,97 @@
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from common import tokenize_line  # noqa: E402
+
+
+# chars/second of the character-run tokenizer, compared with the per-char loop it replaced
+
+
+@dataclass
+class _LegacyElement:
+    text: str
+    font: str
+    size: float
+
+
+@dataclass
+class _LegacySeparator:
+    type: int
+
+
+def _legacy_simple_font(font):
+    match = re.match(r'.*\+(.*)', font)
+    return match.group(1) if match else font
+
+
+def _legacy_tokenize_line(line):
+    elems = []
+
+    for text, font, size in line:
+        if len(elems) == 0:
+            elems.append(_LegacyElement(text, _legacy_simple_font(font), size))
+            continue
+
+        if font is None:
+            elems.append(_LegacySeparator(1 if text == ' ' else 0))
+            continue
+
+        if len(text.strip()) == 0:
+            elems.append(_LegacySeparator(2))
+            continue
+
+        prev_elem = elems[-1]
+        if isinstance(prev_elem, _LegacyElement) and _legacy_simple_font(font) == prev_elem.font \
+                and size == prev_elem.size:
+            prev_elem.text += text
+        else:
+            elems.append(_LegacyElement(text, _legacy_simple_font(font), size))
+
+    return elems
+
+
+def _make_lines(count, seed=0):
+    rnd = random.Random(seed)
+    fonts = ['ABCDEF+MyriadPro-Regular', 'ABCDEF+MyriadPro-It', 'ABCDEF+MyriadPro-Bold']
+    lines = []
+
+    for _ in range(count):
+        line = []
+        for word in range(rnd.randint(2, 8)):
+            if word:
+                line.append((' ', None, None) if rnd.random() < 0.5 else (' ', fonts[0], 10.0))
+            font = rnd.choice(fonts)
+            line.extend((c, font, 10.0) for c in 'abcdefghijklmnopqrstuvwxyzåäö'[:rnd.randint(3, 20)])
+        line.append(('\n', None, None))
+        lines.append(line)
+
+    return lines
+
+
+def _chars_per_second(tokenize, lines, repeat):
+    chars = sum(len(line) for line in lines)
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            tokenize(line)
+        best = min(best, time.perf_counter() - start)
+
+    return chars / best
+
+
+if __name__ == '__main__':
+    lines = _make_lines(20000)
+
+    before = _chars_per_second(_legacy_tokenize_line, lines, 3)
+    after = _chars_per_second(tokenize_line, lines, 3)
+
+    print(f'before: {before:,.0f} chars/s')
+    print(f'after:  {after:,.0f} chars/s ({after / before:.2f}x)')
@@ -0,0 +1,263 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from deck_writer import write_decks
+from element_cache import ElementCache
+from headword_index import HeadwordIndex
+from ordkort.backends import create_backend
+from ordkort.deck_creator import build_deck as build_ordkort_deck, create_deck as create_ordkort_deck
+from ordkort.dictionary import DictionaryIndex
+from ordkort.process_pdf import Pair as OrdkortPair, get_pairs as get_ordkort_pairs
+from ordkort.translate import TranslationEngine
+from ordkort.translation_cache import TranslationCache
+from ordlista.deck_creator import build_deck as build_ordlista_deck, create_deck as create_ordlista_deck
+from ordlista.process_pdf import Pair as OrdlistaPair, get_pairs as get_ordlista_pairs
+from pair_store import PairStore, pairs_file, write_pairs
+
+
+# builds any number of decks in parallel, one process per job
+
+
+RIVSTART_JOBS = [
+    ('ordlista_a1a2.pdf', 'ordlista', 'Rivstart A1+A2', 'rivstart_a1a2_ordlista.apkg'),
+    ('ordlista_b1b2.pdf', 'ordlista', 'Rivstart B1+B2', 'rivstart_b1b2_ordlista.apkg'),
+    ('ordkort_b1b2.pdf', 'ordkort', 'Rivstart B1+B2 (ordkort)', 'rivstart_b1b2_ordkort.apkg'),
+    ('ordkort_b2c1.pdf', 'ordkort', 'Rivstart B2+C1 (ordkort)', 'rivstart_b2c1_ordkort.apkg'),
+]
+
+KINDS = ('ordlista', 'ordkort')
+
+
+def load_manifest(file):
+    # a JSON list of {"pdf": ..., "kind": ..., "name": ..., "output": ...}
+    with open(Path(file).expanduser(), encoding='utf-8') as f:
+        return [(job['pdf'], job['kind'], job['name'], job['output']) for job in json.load(f)]
+
+
+def subdeck_name(parent, name):
+    # 'Rivstart A1+A2' becomes 'Rivstart::A1+A2'
+    if name.startswith(parent + ' '):
+        name = name[len(parent) + 1:]
+    return f'{parent}::{name}'
+
+
+def _ordlista_pairs(pdf, options):
+    return get_ordlista_pairs(pdf, options['parse_workers'], options['element_cache'], options['extraction'])
+
+
+def _ordkort_pairs(pdf, options):
+    # backends, dictionaries and cache connections are built inside the worker, none of them can be pickled
+    dictionary = options['index']
+    if options['dictionary']:
+        # headwords glossed in other volumes take precedence over the dictionary file
+        dictionary = dictionary if dictionary is not None else DictionaryIndex()
+        dictionary.load(options['dictionary'])
+    backend = create_backend(options['backend'], dictionary, options['backend_url'])
+    if options['backend'] == 'dictionary':
+        dictionary = None
+
+    engine = TranslationEngine(backend, workers=options['translate_workers'], batch_size=options['batch_size'])
+    # sqlite's WAL mode lets the jobs share one cache file
+    cache = TranslationCache(options['cache']) if options['cache'] else None
+
+    try:
+        return get_ordkort_pairs(pdf, True, cache, engine, options['resume'], dictionary, options['parse_workers'],
+                                 options['element_cache'], options['extraction'])
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _kind(kind):
+    if kind == 'ordlista':
+        return OrdlistaPair, _ordlista_pairs, create_ordlista_deck
+    elif kind == 'ordkort':
+        return OrdkortPair, _ordkort_pairs, create_ordkort_deck
+    raise Exception()
+
+
+def run_job(job, options):
+    pdf, kind, name, output = job
+    start = time.perf_counter()
+    cpu = time.process_time()
+    pair_type, get_pairs, create_deck = _kind(kind)
+
+    if options['from_pairs']:
+        # the pairs go back to the parent, a memory map can't be pickled
+        with PairStore(pairs_file(output), pair_type) as store:
+            pairs = list(store)
+    else:
+        pairs = get_pairs(pdf, options)
+        write_pairs(pairs_file(output), pair_type, pairs)
+
+    if options['combined'] or options['headwords']:
+        # the parent writes every volume into one package, or the decks once the headwords of all volumes are indexed
+        changes = None
+    else:
+        changes = create_deck(name, pairs, output, options['delta'], options['bulk'])
+
+    return pairs, changes, time.perf_counter() - start, time.process_time() - cpu
+
+
+def write_job(job, pairs, options):
+    pdf, kind, name, output = job
+    return _kind(kind)[2](name, pairs, output, options['delta'], options['bulk'])
+
+
+def write_combined(jobs, pairs, output, parent, options):
+    decks = []
+    for pdf, kind, name, _ in jobs:
+        build_deck = build_ordlista_deck if kind == 'ordlista' else build_ordkort_deck
+        decks.append(build_deck(subdeck_name(parent, name), pairs[name], name))
+
+    return write_decks(decks, output, options['delta'], options['bulk'], compress=True)
+
+
+def _run(pool, jobs, options, results):
+    failed = 0
+    futures = {pool.submit(run_job, job, options): job for job in jobs}
+
+    for future in as_completed(futures):
+        pdf, kind, name, output = futures[future]
+        try:
+            pairs, changes, wall, cpu = future.result()
+        except Exception as e:
+            failed += 1
+            print(f'{name}: failed ({e!r})')
+            continue
+
+        results[name] = pairs
+        if changes is None:
+            print(f'{name}: {len(pairs)} cards in {wall:.1f}s ({cpu:.1f}s CPU)')
+        else:
+            status = f'{changes}' if changes.written else 'unchanged, not rewritten'
+            print(f'{name}: {len(pairs)} cards -> {output} ({status}) in {wall:.1f}s ({cpu:.1f}s CPU)')
+
+    return failed
+
+
+def _write_jobs(pool, jobs, results, options):
+    failed = 0
+    futures = {pool.submit(write_job, job, results[job[2]], options): job for job in jobs if job[2] in results}
+
+    for future in as_completed(futures):
+        pdf, kind, name, output = futures[future]
+        try:
+            changes = future.result()
+        except Exception as e:
+            failed += 1
+            print(f'{name}: failed ({e!r})')
+            continue
+
+        status = f'{changes}' if changes.written else 'unchanged, not rewritten'
+        print(f'{name}: -> {output} ({status})')
+
+    return failed
+
+
+def run_jobs(jobs, workers, options, parent='Rivstart'):
+    results = {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(workers) as pool:
+        if options['headwords']:
+            # volumes with printed English go first, the ordkort then only translate words none of them gloss
+            index = HeadwordIndex()
+            glossed = [job for job in jobs if job[1] == 'ordlista']
+            rest = [job for job in jobs if job[1] != 'ordlista']
+
+            failed = _run(pool, glossed, options, results)
+            for pdf, kind, name, output in glossed:
+                if name in results:
+                    index.add_volume(name, results[name])
+
+            failed += _run(pool, rest, dict(options, index=index), results)
+            for pdf, kind, name, output in rest:
+                if name in results:
+                    index.add_volume(name, results[name])
+
+            # the duplicates are reported before any deck is written
+            index.print_duplicates()
+            if not options['combined']:
+                failed += _write_jobs(pool, jobs, results, options)
+        else:
+            failed = _run(pool, jobs, options, results)
+
+    if options['combined'] and not failed:
+        changes = write_combined(jobs, results, options['combined'], parent, options)
+        status = f'{changes}' if changes.written else 'unchanged, not rewritten'
+        print(f'{len(jobs)} volumes -> {options["combined"]} ({status})')
+
+    print(f'{len(results)} decks built, {failed} failed in {time.perf_counter() - start:.1f}s')
+    return failed == 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--job', nargs=4, action='append', default=[], metavar=('PDF', 'KIND', 'NAME', 'OUTPUT'),
+                        help='deck to build, KIND is ordlista or ordkort; can be repeated')
+    parser.add_argument('--manifest', help='JSON file listing the jobs')
+    parser.add_argument('--jobs', type=int, help='decks built at the same time, defaults to one per job')
+    parser.add_argument('--parse-workers', type=int, default=1, help='processes used for PDF layout analysis per job')
+    parser.add_argument('--parse-cache', default='.parse_cache', help='directory caching parsed PDF elements')
+    parser.add_argument('--no-parse-cache', action='store_true', help='always parse the PDFs from scratch')
+    parser.add_argument('--extraction', choices=['layout', 'fast'], default='layout',
+                        help='full pdfminer layout analysis, or character runs straight from the interpreter')
+    parser.add_argument('--cache', default='translations.sqlite', help='translation cache file')
+    parser.add_argument('--no-cache', action='store_true', help='always ask the translator')
+    parser.add_argument('--backend', choices=['google', 'dictionary', 'noop', 'http'], default='google',
+                        help='translation backend')
+    parser.add_argument('--dictionary', help='TSV dictionary file consulted before the translator')
+    parser.add_argument('--backend-url', default='http://127.0.0.1:8765', help='URL of the http backend')
+    parser.add_argument('--workers', type=int, default=4, help='translation requests kept in flight per job')
+    parser.add_argument('--batch-size', type=int, default=1, help='words packed into a single translation request')
+    parser.add_argument('--delta', action='store_true', help='also write a package with only the new and changed notes')
+    parser.add_argument('--bulk-writer', action='store_true',
+                        help='write packages with batched inserts instead of genanki, for large decks')
+    parser.add_argument('--combined', metavar='OUTPUT',
+                        help='write all volumes as subdecks into this one package instead of one package each')
+    parser.add_argument('--parent', default='Rivstart', help='parent deck of the volumes in a combined package')
+    parser.add_argument('--headwords', action='store_true',
+                        help='reuse English printed in the ordlista for ordkort words and report duplicate headwords')
+    parser.add_argument('--resume', action='store_true', help='continue from the translation journals of a failed run')
+    parser.add_argument('--from-pairs', action='store_true',
+                        help='build the decks from the .pairs file next to each output instead of parsing the PDFs')
+    args = parser.parse_args()
+
+    if args.backend == 'dictionary' and not args.dictionary:
+        parser.error('the dictionary backend needs --dictionary')
+
+    jobs = [tuple(job) for job in args.job]
+    if args.manifest:
+        jobs += load_manifest(args.manifest)
+    if not jobs:
+        jobs = RIVSTART_JOBS
+
+    for job in jobs:
+        if job[1] not in KINDS:
+            parser.error(f'unknown kind {job[1]}, expected one of {", ".join(KINDS)}')
+
+    options = dict(
+        parse_workers=args.parse_workers,
+        element_cache=None if args.no_parse_cache else ElementCache(args.parse_cache),
+        extraction=args.extraction,
+        cache=None if args.no_cache else args.cache,
+        backend=args.backend,
+        dictionary=args.dictionary,
+        backend_url=args.backend_url,
+        translate_workers=args.workers,
+        batch_size=args.batch_size,
+        resume=args.resume,
+        delta=args.delta,
+        bulk=args.bulk_writer,
+        combined=args.combined,
+        headwords=args.headwords,
+        index=None,
+        from_pairs=args.from_pairs,
+    )
+
+    sys.exit(0 if run_jobs(jobs, args.jobs if args.jobs else len(jobs), options, args.parent) else 1)
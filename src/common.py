@@ -1,24 +1,320 @@
 import re
+import sys
+from functools import lru_cache
+from pathlib import Path
 from typing import Any, Iterable
 
-from pdfminer.layout import LTTextLineHorizontal
+# pdfminer and multiprocessing are imported where a PDF is actually read, a parse cache hit never needs them
 
 
-def extract_text(pages):
-    lines = []
+def iter_text_lines(pages):
+    from pdfminer.layout import LTTextLineHorizontal
 
+    # streams lines page by page, so a page's layout tree can be freed once its lines are consumed
     def show_ltitem_hierarchy(o: Any):
         if isinstance(o, LTTextLineHorizontal):
-            lines.append(o)
+            yield o
+            # no need to descend into the characters of a line
+            return
 
         if isinstance(o, Iterable):
             for i in o:
-                show_ltitem_hierarchy(i)
+                yield from show_ltitem_hierarchy(i)
 
-    show_ltitem_hierarchy(pages)
-    return lines
+    for page in pages:
+        yield from show_ltitem_hierarchy(page)
 
 
+SEPARATOR_NEWLINE = 0
+SEPARATOR_SPACE = 1
+SEPARATOR_EMPTY = 2
+
+
+class Element:
+    __slots__ = ('text', 'font', 'size')
+
+    def __init__(self, text, font, size):
+        self.text = text
+        self.font = font
+        self.size = size
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.text == other.text and self.font == other.font and self.size == other.size
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{self.text} [{self.font}]'
+
+
+class Separator:
+    __slots__ = ('type',)
+
+    def __init__(self, type):
+        self.type = type
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.type == other.type
+
+    __hash__ = None
+
+    def __repr__(self):
+        if self.type == SEPARATOR_NEWLINE:
+            return 'ANNO NL'
+        elif self.type == SEPARATOR_SPACE:
+            return 'ANNO SP'
+        elif self.type == SEPARATOR_EMPTY:
+            return 'EMPTY'
+
+
+class Marker:
+    __slots__ = ('type', 'val')
+
+    def __init__(self, type, val):
+        self.type = type
+        self.val = val
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.type == other.type and self.val == other.val
+
+    __hash__ = None
+
+
+_FONT_SUBSET = re.compile(r'.*\+(.*)')
+
+
+@lru_cache(maxsize=None)
 def simple_font(font):
-    match = re.match(r'.*\+(.*)', font)
-    return match.group(1) if match else font
+    match = _FONT_SUBSET.match(font)
+    # interned, so all elements of a font share one string
+    return sys.intern(match.group(1) if match else font)
+
+
+_fonts = {}
+
+
+def tokenize_line(line, separators=True):
+    # line is a sequence of (text, font, size), font is None for LTAnno
+    elems = []
+    current = None
+    parts = None
+    fonts = _fonts
+
+    for text, font, size in line:
+        if font is None:
+            if not separators:
+                continue
+
+            # LTAnno objs should always be separators
+            if text == ' ':
+                sep = Separator(SEPARATOR_SPACE)
+            elif text == '\n':
+                sep = Separator(SEPARATOR_NEWLINE)
+            else:
+                raise Exception()
+
+            # we always expect a normal char element first
+            if not elems:
+                raise Exception()
+
+        elif separators and elems and not text.strip():
+            # if char is only blank space treat as separator
+            sep = Separator(SEPARATOR_EMPTY)
+
+        else:
+            font_name = fonts.get(font)
+            if font_name is None:
+                font_name = fonts[font] = simple_font(font)
+
+            # join separate chars together, the text is only built once the run is complete
+            if current is not None and font_name == current.font and size == current.size:
+                parts.append(text)
+                continue
+
+            if current is not None:
+                current.text = ''.join(parts)
+
+            current = Element(None, font_name, size)
+            parts = [text]
+            elems.append(current)
+            continue
+
+        if current is not None:
+            current.text = ''.join(parts)
+            current = None
+
+        elems.append(sep)
+
+    if current is not None:
+        current.text = ''.join(parts)
+
+    return elems
+
+
+def page_count(path):
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with open(path, 'rb') as f:
+        document = PDFDocument(PDFParser(f))
+        return resolve1(document.catalog['Pages'])['Count']
+
+
+def _layout_runs(line):
+    from pdfminer.layout import LTAnno, LTChar
+
+    for obj in line:
+        # only expect LTChar or LTAnno
+        if isinstance(obj, LTChar):
+            yield obj.get_text(), obj.fontname, obj.size
+        elif isinstance(obj, LTAnno):
+            yield obj.get_text(), None, None
+        else:
+            raise Exception()
+
+
+def _iter_tokenized_pages(path, page_numbers, laparams, tokenize_line, extraction):
+    # the tokenized lines of one page at a time
+    # laparams are passed around as LAParams keyword arguments, building them needs pdfminer.layout
+    from pdfminer.layout import LAParams
+    laparams = LAParams(**(laparams or {}))
+
+    # pages past the last requested one aren't even looked at
+    maxpages = max(page_numbers) + 1 if page_numbers else 0
+
+    if extraction == 'fast':
+        import fast_extract
+        pages = fast_extract.extract_page_lines(path, page_numbers, laparams, maxpages)
+    else:
+        from pdfminer.high_level import extract_pages
+        pages = (map(_layout_runs, iter_text_lines([page]))
+                 for page in extract_pages(path, page_numbers=page_numbers, maxpages=maxpages, laparams=laparams))
+
+    for lines in pages:
+        yield [tokenize_line(line) for line in lines]
+
+
+def _tokenize_pages(path, page_numbers, laparams, tokenize_line, extraction):
+    # lines are turned into compact elements as they stream in, the layout objects are not kept around
+    return list(_iter_tokenized_pages(path, page_numbers, laparams, tokenize_line, extraction))
+
+
+def _iter_tokenized_pool(path, tokenize_line, laparams, workers, extraction, pages=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    # several small page ranges per worker keep the pool busy when some pages are slower than others
+    count = page_count(path)
+    numbers = [n for n in sorted(pages) if n < count] if pages else list(range(count))
+    size = max(1, -(-len(numbers) // (workers * 4)))
+    ranges = [set(numbers[start:start + size]) for start in range(0, len(numbers), size)]
+
+    with ProcessPoolExecutor(workers) as pool:
+        try:
+            # map keeps the page ranges in order
+            chunks = pool.map(_tokenize_pages, [path] * len(ranges), ranges, [laparams] * len(ranges),
+                              [tokenize_line] * len(ranges), [extraction] * len(ranges))
+            for chunk in chunks:
+                yield from chunk
+        finally:
+            # the consumer may stop early, e.g. after the last requested chapter
+            pool.shutdown(cancel_futures=True)
+
+
+def _cache_key(cache, path, laparams, version, extraction, pages=None):
+    # a page subset is cached apart from the whole document
+    return cache.key(path, laparams, f'{version}-{extraction}' + (f'-{sorted(pages)}' if pages else ''))
+
+
+def iter_tokenized_pdf(path, tokenize_line, laparams=None, workers=1, extraction='layout', cache=None, version=None,
+                       pages=None):
+    if cache:
+        key = _cache_key(cache, path, laparams, version, extraction, pages)
+        cached = cache.load(key)
+        if cached is not None:
+            for lines in cached:
+                yield from lines
+            return
+
+    # lines are encoded for the cache page by page as they are produced, later stages modify them in place
+    encoded = []
+    tokenized = _iter_tokenized_pages(path, set(pages) if pages else None, laparams, tokenize_line, extraction) \
+        if workers <= 1 else _iter_tokenized_pool(path, tokenize_line, laparams, workers, extraction, pages)
+
+    for lines in tokenized:
+        if cache:
+            encoded.append([cache.encode(line) for line in lines])
+        yield from lines
+
+    # only reached once the whole document was consumed
+    if cache:
+        cache.store(key, encoded)
+
+
+def tokenized_lines_before(path, tokenize_line, page, laparams=None, extraction='layout', cache=None, version=None):
+    # the lines of the pages before a page, from the whole document's cache entry if there is one and otherwise
+    # parsed in one go, without a cache entry of their own
+    if cache:
+        cached = cache.load(_cache_key(cache, path, laparams, version, extraction))
+        if cached is not None:
+            return [line for lines in cached[:page] for line in lines]
+
+    numbers = set(range(min(page, page_count(path))))
+    if not numbers:
+        return []
+    pages = _iter_tokenized_pages(path, numbers, laparams, tokenize_line, extraction)
+    return [line for lines in pages for line in lines]
+
+
+def parse_pages(spec):
+    # '40-55,60' as 0-based page numbers
+    pages = set()
+    for part in spec.split(','):
+        first, dash, last = part.strip().partition('-')
+        if not first.isdigit() or dash and not last.isdigit() or int(first) < 1 or int(last or first) < int(first):
+            raise ValueError(f'invalid page range {part!r}')
+        pages.update(range(int(first) - 1, int(last or first)))
+    return sorted(pages)
+
+
+def subset_name(pages=None, chapters=None):
+    # e.g. 'kapitel7+8' or 'sidor40-55', None for the whole volume
+    parts = []
+
+    if chapters:
+        parts.append('kapitel' + '+'.join(str(c) for c in sorted(chapters)))
+
+    if pages:
+        ranges = []
+        for page in sorted(pages):
+            if ranges and ranges[-1][1] == page - 1:
+                ranges[-1][1] = page
+            else:
+                ranges.append([page, page])
+        parts.append('sidor' + '+'.join(f'{a + 1}' if a == b else f'{a + 1}-{b + 1}' for a, b in ranges))
+
+    return '.'.join(parts) or None
+
+
+def subset_file(file, subset):
+    # rivstart_b1b2_ordkort.apkg becomes rivstart_b1b2_ordkort.kapitel7.apkg
+    file = Path(file).expanduser()
+    return file.with_suffix(f'.{subset}{file.suffix}') if subset else file
+
+
+def select_chapters(pairs, chapters):
+    # the chapters come in order, the PDF isn't parsed any further once the last requested one has passed
+    last = max(chapters)
+
+    for pair in pairs:
+        chapter = int(pair.chapter) if pair.chapter and pair.chapter.isdigit() else None
+        if chapter is not None and chapter > last:
+            return
+        if chapter in chapters:
+            yield pair
@@ -0,0 +1,237 @@
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
+import genanki
+from genanki.apkg_col import APKG_COL
+from genanki.apkg_schema import APKG_SCHEMA
+
+from profiler import PROFILER
+
+
+# shared by the ordlista and ordkort deck creators, keeps a manifest next to every package so unchanged decks are
+# not rewritten
+
+
+def deck_id(name, salt):
+    # hash() is randomized per interpreter run, a digest gives the same deck on every build
+    digest = hashlib.sha256(name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % (10 ** 8) * salt
+
+
+def _model_hash(model):
+    # genanki adds bookkeeping keys to fields and templates once a model was written, leave those out
+    fields = [f['name'] for f in model.fields]
+    templates = [(t['name'], t['qfmt'], t['afmt']) for t in model.templates]
+    meta = json.dumps([model.model_id, model.name, fields, templates, model.css])
+    return hashlib.sha256(meta.encode('utf-8')).hexdigest()
+
+
+def _note_hash(deck, note):
+    meta = json.dumps([deck.deck_id, note.fields, sorted(note.tags)], ensure_ascii=False)
+    return hashlib.sha256(meta.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class DeckChanges:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    # guids of notes left out because an earlier note of the package has the same guid
+    duplicates: List[str] = field(default_factory=list)
+    written: bool = False
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self):
+        return f'{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed' \
+            + (f', {len(self.duplicates)} duplicates dropped' if self.duplicates else '')
+
+
+class DeckManifest:
+    # guid -> field hash of every note in the last package written, plus what the whole package depends on
+    def __init__(self, file):
+        self.file = Path(file).expanduser()
+        self.meta = None
+        self.notes = {}
+
+        if self.file.exists():
+            try:
+                with open(self.file, encoding='utf-8') as f:
+                    data = json.load(f)
+                self.meta = data['meta']
+                self.notes = data['notes']
+            except (OSError, ValueError, KeyError):
+                # a broken manifest just means a full rebuild
+                self.meta = None
+                self.notes = {}
+
+    def diff(self, meta, decks):
+        changes = DeckChanges()
+        hashes = {note.guid: _note_hash(d, note) for d, notes in decks for note in notes}
+
+        # different decks or models invalidate every note
+        same_decks = self.meta == meta
+        for guid, digest in hashes.items():
+            if guid not in self.notes:
+                changes.added.append(guid)
+            elif not same_decks or self.notes[guid] != digest:
+                changes.changed.append(guid)
+
+        changes.removed = [guid for guid in self.notes if guid not in hashes]
+        return changes, hashes
+
+    def save(self, meta, hashes):
+        self.meta = meta
+        self.notes = hashes
+
+        tmp = self.file.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'notes': hashes}, f, ensure_ascii=False, separators=(',', ':'))
+        tmp.replace(self.file)
+
+
+def manifest_file(output):
+    return Path(output).expanduser().with_suffix('.manifest.json')
+
+
+def delta_file(output):
+    return Path(output).expanduser().with_suffix('.delta.apkg')
+
+
+def _rows(decks, timestamp):
+    # the same rows genanki's Note.write_to_db and Card.write_to_db insert, built in one pass
+    ids = itertools.count(int(timestamp * 1000))
+    mod = int(timestamp)
+    note_rows = []
+    card_rows = []
+
+    for deck, notes in decks:
+        for note in notes:
+            model = note.model
+            fields = note.fields
+            note_id = next(ids)
+
+            note_rows.append((note_id, note.guid, model.model_id, mod, -1, ' ' + ' '.join(note.tags) + ' ',
+                              '\x1f'.join(fields), fields[model.sort_field_index], 0, 0, ''))
+
+            # fields are escaped by the deck creators, only front/back models are used
+            for card_ord, any_or_all, required in model._req:
+                if (any if any_or_all == 'any' else all)(fields[i] for i in required):
+                    card_rows.append((next(ids), note_id, deck.deck_id, card_ord, mod, -1, 0, 0, note.due,
+                                      0, 0, 0, 0, 0, 0, 0, 0, ''))
+
+    return note_rows, card_rows
+
+
+def write_package(decks, output, timestamp=None, compression=zipfile.ZIP_STORED):
+    # bulk alternative to genanki.Package.write_to_file for (deck, notes) lists, rows go in with executemany inside
+    # a single transaction
+    timestamp = timestamp if timestamp is not None else time.time()
+    note_rows, card_rows = _rows(decks, timestamp)
+
+    fd, db_file = tempfile.mkstemp()
+    os.close(fd)
+
+    try:
+        conn = sqlite3.connect(db_file)
+        # the file is thrown away on failure, no need for a journal or syncing
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.executescript(APKG_SCHEMA)
+        conn.executescript(APKG_COL)
+
+        decks_json = json.loads(conn.execute('SELECT decks FROM col').fetchone()[0])
+        models_json = json.loads(conn.execute('SELECT models FROM col').fetchone()[0])
+        for deck, notes in decks:
+            decks_json[str(deck.deck_id)] = deck.to_json()
+            for model in {note.model.model_id: note.model for note in notes}.values():
+                models_json[str(model.model_id)] = model.to_json(timestamp, deck.deck_id)
+
+        with conn:
+            conn.execute('UPDATE col SET decks = ?, models = ?', (json.dumps(decks_json), json.dumps(models_json)))
+            conn.executemany('INSERT INTO notes VALUES(?,?,?,?,?,?,?,?,?,?,?)', note_rows)
+            conn.executemany('INSERT INTO cards VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)', card_rows)
+        conn.close()
+
+        with zipfile.ZipFile(output, 'w', compression) as f:
+            f.write(db_file, 'collection.anki2')
+            f.writestr('media', '{}')
+    finally:
+        os.remove(db_file)
+
+
+def _write(decks, output, bulk, compress):
+    # genanki only writes stored zips, compressed packages always go through the bulk writer
+    if bulk or compress:
+        write_package(decks, output, compression=zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+        return
+
+    for deck, notes in decks:
+        for note in notes:
+            deck.add_note(note)
+    genanki.Package([deck for deck, notes in decks]).write_to_file(output)
+
+
+def _unique_notes(decks):
+    # Anki merges notes sharing a guid on import, so only the first of them is written
+    seen = set()
+    unique = []
+    duplicates = []
+
+    for deck, notes in decks:
+        kept = []
+        for note in notes:
+            if note.guid in seen:
+                duplicates.append(note.guid)
+            else:
+                seen.add(note.guid)
+                kept.append(note)
+        unique.append((deck, kept))
+
+    return unique, duplicates
+
+
+def write_decks(decks, output, delta=False, bulk=False, compress=False):
+    # several (deck, notes) in one package, e.g. volumes as subdecks sharing their models
+    decks, duplicates = _unique_notes(decks)
+    manifest = DeckManifest(manifest_file(output))
+    models = sorted({_model_hash(note.model) for deck, notes in decks for note in notes})
+    meta = {'decks': [[deck.deck_id, deck.name] for deck, notes in decks], 'models': models}
+
+    with PROFILER.measure('deck.diff', sum(len(notes) for deck, notes in decks)):
+        changes, hashes = manifest.diff(meta, decks)
+    changes.duplicates = duplicates
+    if not changes and manifest.meta == meta and Path(output).expanduser().exists():
+        if delta:
+            # a delta left from an earlier build would be imported again
+            delta_file(output).unlink(missing_ok=True)
+        return changes
+
+    with PROFILER.measure('deck.write', sum(len(notes) for deck, notes in decks)):
+        _write(decks, output, bulk, compress)
+
+    if delta:
+        # only notes that are new or changed, importing it over the full deck updates them in place
+        wanted = set(changes.added) | set(changes.changed)
+        delta_decks = [(genanki.Deck(deck.deck_id, deck.name), [note for note in notes if note.guid in wanted])
+                       for deck, notes in decks]
+        _write(delta_decks, delta_file(output), bulk, compress)
+
+    manifest.save(meta, hashes)
+    changes.written = True
+    return changes
+
+
+def write_deck(deck, notes, output, delta=False, bulk=False):
+    return write_decks([(deck, notes)], output, delta, bulk)
@@ -0,0 +1,62 @@
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from common import Element, Separator
+
+
+# on-disk cache of tokenized PDF lines page by page, keyed by PDF content, layout parameters and parser version
+
+
+# entries of an older layout are never looked up
+FORMAT = 2
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ElementCache:
+    def __init__(self, directory):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, path, laparams, version):
+        import pdfminer
+
+        params = sorted((laparams or {}).items())
+        meta = json.dumps([_file_digest(path), repr(params), version, pdfminer.__version__, FORMAT])
+        return hashlib.sha256(meta.encode('utf-8')).hexdigest()
+
+    def load(self, key):
+        file = self.directory / f'{key}.json.gz'
+        if not file.exists():
+            return None
+
+        try:
+            with gzip.open(file, 'rt', encoding='utf-8') as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            # a cut-short or corrupt entry is just a miss
+            return None
+
+        # a list of lines per page, elements are stored as [text, font, size] and separators as their type
+        return [[[Element(*e) if isinstance(e, list) else Separator(e) for e in line] for line in lines]
+                for lines in pages]
+
+    def encode(self, line):
+        return [[e.text, e.font, e.size] if isinstance(e, Element) else e.type for e in line]
+
+    def store(self, key, data):
+        file = self.directory / f'{key}.json.gz'
+        # build jobs parsing identical PDFs store the same key at the same time
+        tmp = file.with_suffix(f'.{os.getpid()}.tmp')
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        tmp.replace(file)
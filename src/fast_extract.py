@@ -0,0 +1,169 @@
+from pdfminer.converter import PDFLayoutAnalyzer
+from pdfminer.layout import LAParams, LTChar
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.utils import apply_matrix_rect
+
+
+# Extraction engine that skips pdfminer's layout tree. Characters are grouped into lines with the same rules as
+# LTLayoutContainer.group_objects and LTTextLineHorizontal.add, but lines are kept in content-stream order instead
+# of going through text box grouping. Each line is a list of (text, font, size) tuples, with font and size None
+# for the ' ' and '\n' annotations pdfminer would insert.
+
+
+class _Char:
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'text', 'font', 'size')
+
+    def __init__(self, x0, y0, x1, y1, text, font, size):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.text = text
+        self.font = font
+        self.size = size
+
+
+def _halign(obj0, obj1, laparams):
+    if not (obj1.y0 <= obj0.y1 and obj0.y0 <= obj1.y1):
+        return False
+
+    voverlap = min(abs(obj0.y0 - obj1.y1), abs(obj0.y1 - obj1.y0))
+    if not min(obj0.y1 - obj0.y0, obj1.y1 - obj1.y0) * laparams.line_overlap < voverlap:
+        return False
+
+    if obj1.x0 <= obj0.x1 and obj0.x0 <= obj1.x1:
+        hdistance = 0
+    else:
+        hdistance = min(abs(obj0.x0 - obj1.x1), abs(obj0.x1 - obj1.x0))
+
+    return hdistance < max(obj0.x1 - obj0.x0, obj1.x1 - obj1.x0) * laparams.char_margin
+
+
+def _group_lines(chars, laparams):
+    obj0 = None
+    line = None
+
+    for obj1 in chars:
+        if obj0 is not None:
+            halign = _halign(obj0, obj1, laparams)
+
+            if halign and line is not None:
+                line.append(obj1)
+            elif line is not None:
+                yield line
+                line = None
+            elif halign:
+                line = [obj0, obj1]
+            else:
+                yield [obj0]
+                line = None
+
+        obj0 = obj1
+
+    if line is None and obj0 is not None:
+        line = [obj0]
+
+    if line is not None:
+        yield line
+
+
+def _to_runs(chars, word_margin):
+    runs = []
+    last_x1 = float('inf')
+
+    for c in chars:
+        if word_margin and last_x1 < c.x0 - word_margin * max(c.x1 - c.x0, c.y1 - c.y0):
+            runs.append((' ', None, None))
+        last_x1 = c.x1
+        runs.append((c.text, c.font, c.size))
+
+    runs.append(('\n', None, None))
+    return runs
+
+
+class _RunDevice(PDFLayoutAnalyzer):
+    def __init__(self, rsrcmgr, laparams):
+        PDFLayoutAnalyzer.__init__(self, rsrcmgr, laparams=laparams)
+        self.lines = []
+        self._chars = []
+        self._figures = 0
+
+    def begin_page(self, page, ctm):
+        self._chars = []
+        self._figures = 0
+
+    def end_page(self, page):
+        lines = []
+        empties = []
+
+        for chars in _group_lines(self._chars, self.laparams):
+            line = _to_runs(chars, self.laparams.word_margin)
+
+            # whitespace-only lines end up after the text boxes of a page
+            if ''.join(r[0] for r in line).isspace():
+                empties.append(line)
+            else:
+                lines.append(line)
+
+        self.lines.extend(lines)
+        self.lines.extend(empties)
+        self._chars = []
+
+    def begin_figure(self, name, bbox, matrix):
+        # text inside figures is not laid out into lines by pdfminer either
+        self._figures += 1
+
+    def end_figure(self, name):
+        self._figures -= 1
+
+    def paint_path(self, gstate, stroke, fill, evenodd, path):
+        pass
+
+    def render_image(self, name, stream):
+        pass
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, ncs, graphicstate):
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            text = self.handle_undefined_char(font, cid)
+
+        if font.is_vertical():
+            # rare, let pdfminer work out the geometry
+            item = LTChar(matrix, font, fontsize, scaling, rise, text, font.char_width(cid), font.char_disp(cid),
+                          ncs, graphicstate)
+            if not self._figures:
+                self._chars.append(_Char(item.x0, item.y0, item.x1, item.y1, text, item.fontname, item.size))
+            return item.adv
+
+        adv = font.char_width(cid) * fontsize * scaling
+        if self._figures:
+            return adv
+
+        # same geometry as LTChar for horizontal fonts
+        descent = font.get_descent() * fontsize
+        (x0, y0, x1, y1) = apply_matrix_rect(matrix, (0, descent + rise, adv, descent + rise + fontsize))
+        if x1 < x0:
+            (x0, x1) = (x1, x0)
+        if y1 < y0:
+            (y0, y1) = (y1, y0)
+
+        self._chars.append(_Char(x0, y0, x1, y1, text, font.fontname, y1 - y0))
+        return adv
+
+
+def extract_page_lines(path, page_numbers=None, laparams=None, maxpages=0):
+    # the lines of each page as one list
+    laparams = laparams if laparams else LAParams()
+
+    with open(path, 'rb') as f:
+        rsrcmgr = PDFResourceManager(caching=True)
+        device = _RunDevice(rsrcmgr, laparams)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+        for page in PDFPage.get_pages(f, page_numbers, maxpages=maxpages):
+            interpreter.process_page(page)
+            yield device.lines
+            device.lines = []
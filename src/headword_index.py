@@ -0,0 +1,50 @@
+from collections import Counter
+
+from ordkort.dictionary import DictionaryIndex
+from ordkort.translation_cache import normalize
+
+
+# Swedish headwords of every parsed volume. English printed in a volume (the ordlista) is kept as a gloss, so the
+# ordkort translation stage can look it up like a dictionary before asking any translator.
+
+
+class HeadwordIndex(DictionaryIndex):
+    def __init__(self, file=None):
+        self.volumes = {}
+        super().__init__(file)
+
+    def add_volume(self, volume, pairs):
+        counts = self.volumes.setdefault(volume, Counter())
+
+        for pair in pairs:
+            counts[normalize(pair.swedish).lower()] += 1
+            # the first volume giving a word its English wins, so add the ordlista volumes first
+            if pair.english:
+                self.add(pair.swedish, pair.english)
+
+    def glossed(self, pairs):
+        # passes the pairs of a volume already counted through, adding their English once it is there
+        for pair in pairs:
+            if pair.english:
+                self.add(pair.swedish, pair.english)
+            yield pair
+
+    def duplicates(self):
+        # per volume: distinct headwords, repeats within the volume, and headwords also found in another volume
+        report = {}
+
+        for volume, counts in self.volumes.items():
+            others = set()
+            for other, other_counts in self.volumes.items():
+                if other != volume:
+                    others.update(other_counts)
+
+            repeated = sum(count - 1 for count in counts.values())
+            shared = sum(1 for word in counts if word in others)
+            report[volume] = (len(counts), repeated, shared)
+
+        return report
+
+    def print_duplicates(self):
+        for volume, (words, repeated, shared) in self.duplicates().items():
+            print(f'{volume}: {words} headwords, {repeated} repeated within the volume, {shared} also in other volumes')
@@ -0,0 +1,113 @@
+import json
+from pathlib import Path
+
+from common import Element
+
+
+# Layout exceptions of the printed volumes, read from the JSON rule files of a parser. Line rules are indexed by the
+# text of the line's first element, or the line's length for rules that don't look at the first element, so a line
+# costs a few dict lookups however many rules there are. A rule looks like
+#   {"first": "na" | {"startswith": "have you/has ("}, "count": 5, "min_count": 8,
+#    "match": {"4": "art museum" | {"startswith": ...} | {"contains": ...}}}
+# where every key is optional and match is checked against the elements at those positions.
+
+
+# rivstart.json holds the rules of every volume, a volume's own rules are in a file named after it, e.g. b1b2.json
+SHARED_RULES = 'rivstart'
+
+
+def volume_name(file):
+    # ordkort_b1b2.pdf is the b1b2 volume
+    return Path(file).stem.rpartition('_')[2]
+
+
+def load_rules(directory, volume=None):
+    # the shared rules, then the volume's own, lists are appended and mappings updated
+    rules = {}
+    names = [SHARED_RULES] + ([volume] if volume and volume != SHARED_RULES else [])
+
+    for file in (Path(directory) / f'{name}.json' for name in names):
+        if not file.exists():
+            continue
+        with open(file, encoding='utf-8') as f:
+            for key, value in json.load(f).items():
+                if isinstance(value, list):
+                    rules.setdefault(key, []).extend(value)
+                elif isinstance(value, dict):
+                    rules.setdefault(key, {}).update(value)
+                else:
+                    rules[key] = value
+
+    return rules
+
+
+def _text_matches(condition, text):
+    if isinstance(condition, str):
+        return text == condition
+    if 'startswith' in condition:
+        return text.startswith(condition['startswith'])
+    if 'contains' in condition:
+        return condition['contains'] in text
+    raise Exception(f'unknown condition {condition}')
+
+
+class RuleIndex:
+    def __init__(self, rules):
+        self.rules = rules
+        # positions of the rules by first text, by prefix length and prefix, and by count for rules without a first
+        # text, the count itself is checked once a rule is a candidate
+        self.exact = {}
+        prefixes = {}
+        by_count = {}
+        any_count = []
+
+        for order, rule in enumerate(rules):
+            first = rule.get('first')
+            if first is None:
+                if rule.get('count') is None:
+                    any_count.append(order)
+                else:
+                    by_count.setdefault(rule['count'], []).append(order)
+            elif isinstance(first, str):
+                self.exact[first] = self.exact.get(first, ()) + (order,)
+            elif 'startswith' in first:
+                prefix = first['startswith']
+                table = prefixes.setdefault(len(prefix), {})
+                table[prefix] = table.get(prefix, ()) + (order,)
+            else:
+                raise Exception(f'unknown condition {first}')
+
+        self.prefixes = sorted(prefixes.items())
+        self.any_count = tuple(any_count)
+        self.by_count = {count: tuple(orders) + self.any_count for count, orders in by_count.items()}
+
+    def _matches(self, rule, line):
+        count = rule.get('count')
+        if count is not None and len(line) != count or len(line) < rule.get('min_count', 0):
+            return False
+
+        for position, condition in rule.get('match', {}).items():
+            position = int(position)
+            if position >= len(line) or not isinstance(line[position], Element):
+                return False
+            if not _text_matches(condition, line[position].text):
+                return False
+
+        return True
+
+    def lookup(self, line):
+        # the first rule in file order that matches, or None
+        first = line[0].text
+        candidates = self.exact.get(first, ()) + self.by_count.get(len(line), self.any_count)
+        for length, table in self.prefixes:
+            candidates += table.get(first[:length], ())
+
+        if not candidates:
+            return None
+
+        for order in sorted(candidates):
+            rule = self.rules[order]
+            if self._matches(rule, line):
+                return rule
+
+        return None
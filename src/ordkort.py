@@ -1,15 +1,204 @@
-from ordkort.process_pdf import get_pairs
-from ordkort.deck_creator import create_deck
+import argparse
+import json
+from dataclasses import asdict
 
+from common import parse_pages, subset_file, subset_name
+from element_cache import ElementCache
+from headword_index import HeadwordIndex
+from ordkort.dictionary import DictionaryIndex
+from ordkort.process_pdf import Pair, get_pairs, iter_pairs, stream_pairs
+from ordlista.process_pdf import iter_pairs as iter_ordlista_pairs
+from pair_store import PairStore, pairs_file, store_pairs
+from profiler import PROFILER
+
+# the translator, its HTTP stack and genanki are imported where they are used, parsing alone doesn't need them
+
+
+ORDKORT_VOLUMES = [('ordkort_b1b2.pdf', 'Rivstart B1+B2 (ordkort)'), ('ordkort_b2c1.pdf', 'Rivstart B2+C1 (ordkort)')]
+ORDKORT_FILES = [file for file, name in ORDKORT_VOLUMES]
+ORDLISTA_VOLUMES = [('ordlista_a1a2.pdf', 'Rivstart A1+A2'), ('ordlista_b1b2.pdf', 'Rivstart B1+B2')]
+
+
+def _pairs(file, output, from_pairs, translate, pipeline, **options):
+    if from_pairs:
+        # the translated pairs stored by the last build, neither the PDF nor the translator is touched
+        with PairStore(pairs_file(output), Pair) as store:
+            yield from store
+        return
+
+    if not translate:
+        pairs = get_pairs(file, False, **options)
+    elif pipeline:
+        # the pipeline hands translated pairs to the deck while parsing and translation are still running
+        pairs = stream_pairs(file, **options)
+    else:
+        pairs = get_pairs(file, True, **options)
+
+    yield from store_pairs(pairs_file(output), Pair, pairs)
+
+
+def _build(name, pairs, output, delta, bulk, headwords, translate):
+    if not translate:
+        # untranslated pairs are only stored, a deck of them would blank the English of the translated notes when
+        # imported over them
+        print(f'{pairs_file(output)}: {sum(1 for _ in pairs)} untranslated pairs')
+        return
+
+    from ordkort.deck_creator import create_deck
+
+    if headwords is not None:
+        # words translated for this volume are glossed for the next one, as the pairs stream into the deck
+        pairs = headwords.glossed(pairs)
+
+    changes = create_deck(name, pairs, output, delta, bulk)
+    print(f'{output}: {changes}' + ('' if changes.written else ', not rewritten'))
+
+
+def _output(file, subset, translate):
+    # untranslated pairs are kept apart so they never replace the pairs of a translated deck
+    file = subset_file(file, subset)
+    return file if translate else subset_file(file, 'untranslated')
+
+
+def main(b1_file, b2_file, translate=True, pipeline=False, delta=False, bulk=False, headwords=None, from_pairs=False,
+         pages=None, chapters=None, **options):
+    # a subset of the pages or chapters is written next to the whole deck, with the same deck and note ids
+    subset = subset_name(pages, chapters)
 
-def main(b1_file, b2_file):
     if b1_file:
-        b1_pairs = get_pairs(b1_file, True)
-        create_deck('Rivstart B1+B2 (ordkort)', b1_pairs, 'rivstart_b1b2_ordkort.apkg')
+        b1_output = _output('rivstart_b1b2_ordkort.apkg', subset, translate)
+        b1_pairs = _pairs(b1_file, b1_output, from_pairs, translate, pipeline, pages=pages, chapters=chapters,
+                          **options)
+        _build(ORDKORT_VOLUMES[0][1], b1_pairs, b1_output, delta, bulk, headwords, translate)
 
     if b2_file:
-        b2_pairs = get_pairs(b2_file, True)
-        create_deck('Rivstart B2+C1 (ordkort)', b2_pairs, 'rivstart_b2c1_ordkort.apkg')
+        b2_output = _output('rivstart_b2c1_ordkort.apkg', subset, translate)
+        b2_pairs = _pairs(b2_file, b2_output, from_pairs, translate, pipeline, pages=pages, chapters=chapters,
+                          **options)
+        _build(ORDKORT_VOLUMES[1][1], b2_pairs, b2_output, delta, bulk, headwords, translate)
+
+
+def print_pairs(files, workers=1, element_cache=None, extraction='layout', pages=None, chapters=None):
+    # untranslated pairs as JSON lines, for checking the parser without building anything
+    for file in files:
+        for pair in iter_pairs(file, workers, element_cache, extraction, pages, chapters):
+            print(json.dumps(asdict(pair), ensure_ascii=False))
+
+
+def run_translated(args, parse_options, deck_options):
+    from ordkort.backends import create_backend
+    from ordkort.translate import TranslationEngine
+    from ordkort.translation_cache import TranslationCache
+
+    headword_index = None
+    if args.headwords:
+        headword_index = HeadwordIndex()
+        for file, name in ORDLISTA_VOLUMES:
+            headword_index.add_volume(name, iter_ordlista_pairs(file, **parse_options))
+        # the ordkort headwords are counted from the parsed cards, so the duplicates are known before any deck is built
+        for file, name in ORDKORT_VOLUMES:
+            headword_index.add_volume(name, iter_pairs(file, **parse_options, pages=deck_options['pages'],
+                                                       chapters=deck_options['chapters']))
+        headword_index.print_duplicates()
+        # the dictionary file only fills in words the ordlista doesn't gloss
+        if args.dictionary:
+            headword_index.load(args.dictionary)
+        dictionary_index = headword_index
+    else:
+        dictionary_index = DictionaryIndex(args.dictionary) if args.dictionary else None
+
+    backend = create_backend(args.backend, dictionary_index, args.backend_url)
+    # the index whose hit rate is reported at the end
+    lookup_index = dictionary_index
+    if args.backend == 'dictionary':
+        # the backend already is the dictionary
+        lookup_index = backend.index
+        dictionary_index = None
+
+    translation_engine = TranslationEngine(backend, workers=args.workers, batch_size=args.batch_size)
+
+    options = dict(pipeline=args.pipeline, headwords=headword_index, engine=translation_engine, resume=args.resume,
+                   dictionary=dictionary_index, **deck_options, **parse_options)
+
+    if args.no_cache:
+        main(*ORDKORT_FILES, **options)
+    else:
+        with TranslationCache(args.cache, args.cache_max_entries, args.cache_max_age) as translation_cache:
+            if args.export_cache:
+                print(f'exported {translation_cache.export(args.export_cache)} translations')
+            elif args.import_cache:
+                print(f'imported {translation_cache.import_(args.import_cache)} translations')
+            else:
+                main(*ORDKORT_FILES, cache=translation_cache, **options)
+
+    if lookup_index is not None:
+        print(f'dictionary: {lookup_index.hits} hits, {lookup_index.misses} misses '
+              f'({lookup_index.hit_rate:.0%} hit rate)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cache', default='translations.sqlite', help='translation cache file')
+    parser.add_argument('--no-cache', action='store_true', help='always ask the translator')
+    parser.add_argument('--cache-max-entries', type=int, help='evict least recently used translations above this size')
+    parser.add_argument('--cache-max-age', type=float, help='evict translations older than this many days')
+    parser.add_argument('--backend', choices=['google', 'dictionary', 'noop', 'http'], default='google',
+                        help='translation backend')
+    parser.add_argument('--dictionary', help='TSV dictionary file consulted before the translator')
+    parser.add_argument('--backend-url', default='http://127.0.0.1:8765', help='URL of the http backend')
+    parser.add_argument('--workers', type=int, default=4, help='translation requests kept in flight')
+    parser.add_argument('--batch-size', type=int, default=1, help='words packed into a single translation request')
+    parser.add_argument('--parse-workers', type=int, default=1, help='processes used for PDF layout analysis')
+    parser.add_argument('--parse-cache', default='.parse_cache', help='directory caching parsed PDF elements')
+    parser.add_argument('--no-parse-cache', action='store_true', help='always parse the PDFs from scratch')
+    parser.add_argument('--extraction', choices=['layout', 'fast'], default='layout',
+                        help='full pdfminer layout analysis, or character runs straight from the interpreter')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='overlap PDF parsing, translation and deck writing')
+    parser.add_argument('--delta', action='store_true', help='also write a package with only the new and changed notes')
+    parser.add_argument('--bulk-writer', action='store_true',
+                        help='write packages with batched inserts instead of genanki, for large decks')
+    parser.add_argument('--headwords', action='store_true',
+                        help='reuse English printed in the ordlista PDFs and report duplicate headwords')
+    parser.add_argument('--pages', type=parse_pages, metavar='RANGES',
+                        help='only parse these pages, e.g. 40-55,60')
+    parser.add_argument('--chapters', type=int, nargs='+', metavar='N',
+                        help='only build these chapters, parsing stops after the last of them')
+    parser.add_argument('--from-pairs', action='store_true',
+                        help='build the decks from the .pairs files of the last build, without parsing or translating')
+    parser.add_argument('--no-translate', action='store_true',
+                        help='only parse the PDFs and store the pairs in .untranslated.pairs files, no deck is built')
+    parser.add_argument('--pairs-only', action='store_true',
+                        help='print the parsed, untranslated pairs as JSON lines instead of building decks')
+    parser.add_argument('--resume', action='store_true', help='continue from the translation journal of a failed run')
+    parser.add_argument('--export-cache', metavar='FILE', help='export the translation cache and exit')
+    parser.add_argument('--import-cache', metavar='FILE', help='import translations into the cache and exit')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write per-stage timings, memory and translation stats as JSON')
+    parser.add_argument('--profile-stage', metavar='STAGE',
+                        help='also run cProfile inside this stage, e.g. ordlista.tokenize')
+    parser.add_argument('--profile-dump', metavar='FILE', help='pstats file for the cProfile of --profile-stage')
+    args = parser.parse_args()
+
+    if args.profile:
+        PROFILER.enable(args.profile_stage)
+
+    if args.backend == 'dictionary' and not args.dictionary:
+        parser.error('the dictionary backend needs --dictionary')
+
+    element_cache = None if args.no_parse_cache else ElementCache(args.parse_cache)
+    parse_options = dict(workers=args.parse_workers, element_cache=element_cache, extraction=args.extraction)
+    deck_options = dict(delta=args.delta, bulk=args.bulk_writer)
+    subset_options = dict(pages=args.pages, chapters=set(args.chapters) if args.chapters else None)
 
+    if args.pairs_only:
+        print_pairs(ORDKORT_FILES, **parse_options, **subset_options)
+    elif args.from_pairs:
+        main(*ORDKORT_FILES, from_pairs=True, **deck_options, **subset_options)
+    elif args.no_translate:
+        main(*ORDKORT_FILES, translate=False, **deck_options, **parse_options, **subset_options)
+    else:
+        run_translated(args, parse_options, dict(deck_options, **subset_options))
 
-main('ordkort_b1b2.pdf', 'ordkort_b2c1.pdf')
+    if args.profile:
+        PROFILER.write(args.profile, args.profile_dump)
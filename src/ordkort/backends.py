@@ -0,0 +1,126 @@
+import json
+import re
+import threading
+
+from ordkort.dictionary import DictionaryIndex
+
+# deep_translator and urllib.request pull in a whole HTTP stack, they are only imported once a backend is used
+
+
+BATCH_DELIMITER = ' ||| '
+
+
+def join_batch(texts):
+    return BATCH_DELIMITER.join(texts)
+
+
+def split_batch(translated, count):
+    parts = [p.strip() for p in re.split(r'\s*\|\s*\|\s*\|\s*', translated)]
+
+    if len(parts) != count or any(len(p) == 0 for p in parts):
+        return None
+    return parts
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+class Backend:
+    name = None
+    # remote backends go through the rate limiter
+    remote = True
+
+    def translate(self, text):
+        raise NotImplementedError()
+
+    def is_throttle(self, error):
+        return isinstance(error, TooManyRequests)
+
+    def translate_batch(self, texts):
+        # returns None if the delimited payload did not split back into one translation per text
+        return split_batch(self.translate(join_batch(texts)), len(texts))
+
+
+class GoogleBackend(Backend):
+    name = 'google'
+
+    def __init__(self, source='sv', target='en'):
+        self.source = source
+        self.target = target
+        self._local = threading.local()
+
+    def translate(self, text):
+        # GoogleTranslator keeps per-request state, so reuse one instance per worker thread
+        if not hasattr(self._local, 'translator'):
+            from deep_translator import GoogleTranslator
+            self._local.translator = GoogleTranslator(source=self.source, target=self.target)
+        return self._local.translator.translate(text)
+
+    def is_throttle(self, error):
+        from deep_translator.exceptions import TooManyRequests as GoogleTooManyRequests
+        return isinstance(error, GoogleTooManyRequests)
+
+
+class DictionaryBackend(Backend):
+    name = 'dictionary'
+    remote = False
+
+    def __init__(self, file):
+        self.index = file if isinstance(file, DictionaryIndex) else DictionaryIndex(file)
+
+    def translate(self, text):
+        english = self.index.lookup(text)
+        return english if english is not None else ''
+
+    def translate_batch(self, texts):
+        return [self.translate(text) for text in texts]
+
+
+class NoopBackend(Backend):
+    name = 'noop'
+    remote = False
+
+    def translate(self, text):
+        return ''
+
+    def translate_batch(self, texts):
+        return ['' for _ in texts]
+
+
+class HttpBackend(Backend):
+    # talks to standin_server.py, or anything else answering GET /translate?q=... with {"translation": ...}
+    name = 'http'
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def translate(self, text):
+        from urllib.error import HTTPError
+        from urllib.parse import urlencode
+        from urllib.request import urlopen
+
+        try:
+            with urlopen(f'{self.url}/translate?{urlencode({"q": text})}', timeout=self.timeout) as response:
+                return json.loads(response.read())['translation']
+        except HTTPError as e:
+            if e.code == 429:
+                raise TooManyRequests() from e
+            raise
+
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'dictionary': DictionaryBackend,
+    'noop': NoopBackend,
+    'http': HttpBackend,
+}
+
+
+def create_backend(name, dictionary=None, url=None):
+    if name == 'dictionary':
+        return DictionaryBackend(dictionary)
+    elif name == 'http':
+        return HttpBackend(url) if url else HttpBackend()
+    return BACKENDS[name]()
@@ -1,6 +1,9 @@
 import genanki
 import html
 
+from deck_writer import deck_id, write_deck
+from profiler import PROFILER
+
 
 swe_eng_front_template = \
     '''
@@ -62,9 +65,14 @@ style = \
 
 
 class SwedishNote(genanki.Note):
+    # set when several volumes share a package, so the same word in two volumes stays two notes
+    volume = None
+
     @property
     def guid(self):
-        return genanki.guid_for(self.fields[0], self.fields[2], '24752456')
+        if self.volume is None:
+            return genanki.guid_for(self.fields[0], self.fields[2], '24752456')
+        return genanki.guid_for(self.fields[0], self.fields[2], '24752456', self.volume)
 
 
 my_model = genanki.Model(
@@ -91,11 +99,12 @@ my_model = genanki.Model(
     css=style)
 
 
-def create_deck(name, pairs, output):
+def build_deck(name, pairs, volume=None):
     my_deck = genanki.Deck(
-        abs(hash(name)) % (10 ** 8) * 98294,
+        deck_id(name, 98294),
         name
     )
+    notes = []
 
     for pair in pairs:
         tags = [f'Kapitel{pair.chapter}']
@@ -107,12 +116,22 @@ def create_deck(name, pairs, output):
             model=my_model,
             fields=[
                 html.escape(pair.swedish),
-                html.escape(pair.english),
+                html.escape(pair.english) if pair.english else '',
                 pair.chapter if pair.chapter else '',
                 pair.text if pair.text else ''
             ],
             tags=tags
         )
-        my_deck.add_note(note)
+        note.volume = volume
+        notes.append(note)
+
+    return my_deck, notes
+
+
+def create_deck(name, pairs, output, delta=False, bulk=False):
+    with PROFILER.measure('ordkort.build_deck'):
+        my_deck, notes = build_deck(name, pairs)
+    PROFILER.items('ordkort.build_deck', len(notes))
+    PROFILER.count('ordkort.notes', len(notes))
 
-    genanki.Package(my_deck).write_to_file(output)
+    return write_deck(my_deck, notes, output, delta, bulk)
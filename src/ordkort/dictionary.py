@@ -0,0 +1,67 @@
+import re
+import unicodedata
+from pathlib import Path
+
+
+_ARTICLES = ('en ', 'ett ', 'att ')
+
+
+def _variants(text):
+    text = ' '.join(unicodedata.normalize('NFC', text).split())
+    yield text
+
+    lower = text.lower()
+    yield lower
+
+    # drop bracketed conjugations and notes, e.g. 'köra (kör, körde, kört)'
+    bare = ' '.join(re.sub(r'\(.*?\)', ' ', lower).split())
+    yield bare
+
+    for article in _ARTICLES:
+        if bare.startswith(article):
+            yield bare[len(article):]
+
+
+class DictionaryIndex:
+    # swedish -> english lookups from a local TSV file, tolerant to articles, case and bracketed notes
+    def __init__(self, file=None):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+        if file:
+            self.load(file)
+
+    def load(self, file):
+        with open(Path(file).expanduser(), encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) < 2 or not parts[0].strip() or not parts[1].strip():
+                    continue
+
+                self.add(parts[0], parts[1].strip())
+
+    def add(self, swedish, english):
+        for key in _variants(swedish):
+            self.entries.setdefault(key, english)
+
+    def lookup(self, swedish):
+        for key in _variants(swedish):
+            english = self.entries.get(key)
+            if english is not None:
+                self.hits += 1
+                return english
+
+        self.misses += 1
+        return None
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+
+class TranslationJournal:
+    # append-only log of (index, swedish, english), written as translations arrive
+    def __init__(self, file):
+        self.path = Path(file).expanduser()
+        self._file = None
+
+    def load(self):
+        entries = {}
+
+        if not self.path.exists():
+            return entries
+
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    index, swedish, english = json.loads(line)
+                except ValueError:
+                    # last line may be cut short if the previous run was killed mid-write
+                    continue
+
+                entries[index] = (swedish, english)
+
+        return entries
+
+    def open(self, resume):
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+
+        # start on a fresh line after a cut-short entry
+        if resume and self._file.tell() > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, 2)
+                if f.read(1) != b'\n':
+                    self._file.write('\n')
+
+    def append(self, index, swedish, english):
+        self._file.write(json.dumps([index, swedish, english], ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -1,12 +1,16 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from time import sleep
-from common import extract_text, simple_font
+from common import Element, Marker, iter_tokenized_pdf, select_chapters, subset_file, subset_name, tokenize_line, \
+    tokenized_lines_before
+from layout_rules import load_rules, volume_name
+from ordkort.journal import TranslationJournal
+from profiler import PROFILER
 
-from deep_translator import GoogleTranslator
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import LAParams
-from pdfminer.layout import LTChar, LTAnno
+# bump when the tokenization changes, invalidates the parsed element cache
+PARSER_VERSION = 1
+
+_LAPARAMS = dict(line_margin=0.5)
 
 
 @dataclass
@@ -17,74 +21,52 @@ class Pair:
     english: str
 
 
-@dataclass
-class _Element:
-    text: str
-    font: str
-    size: float
+_Element = Element
 
-    def __repr__(self):
-        return f'{self.text} [{self.font}]'
+MARKER_CHAPTER = 0
+MARKER_TEXT = 1
 
+# layout exceptions of the printed volumes, a new edition adds a file to rules/
+_RULES_DIRECTORY = Path(__file__).parent / 'rules'
 
-@dataclass
-class _Marker:
-    type: int
-    val: str
 
-    def __repr__(self):
-        return f'MARKER CHAPTER {self.val}' if type == 0 else f'MARKER TEXT "{self.val}"'
-
-
-def _proccess_pdf(file):
-    path = Path(file).expanduser()
-    pages = extract_pages(path, laparams=LAParams(line_margin=0.5))
-    lines = extract_text(pages)
+@lru_cache(maxsize=None)
+def _volume_rules(volume):
+    rules = load_rules(_RULES_DIRECTORY, volume)
+    # the cards are single elements, the rules are looked up by their text
+    return {
+        'chapter_starts': {rule['text']: rule for rule in rules.get('chapter_starts', [])},
+        'glued': {rule['text']: rule for rule in rules.get('glued', [])},
+        'chapter_remaps': rules.get('chapter_remaps', {}),
+        'chapter_prefixes': rules.get('chapter_prefixes', []),
+        'max_chapter': rules.get('max_chapter', 18),
+    }
 
-    elements = []
 
-    for line in lines:
-        elems = []
+class _Marker(Marker):
+    __slots__ = ()
 
-        for obj in line:
-            # only expect LTChar or LTAnno
-            if not isinstance(obj, LTChar | LTAnno):
-                raise Exception()
-
-            if isinstance(obj, LTAnno):
-                continue
-
-            # extract first element
-            if len(elems) == 0:
-                # we always expect a normal char element
-                if not isinstance(obj, LTChar):
-                    raise Exception()
+    def __repr__(self):
+        return f'MARKER CHAPTER {self.val}' if self.type == MARKER_CHAPTER else f'MARKER TEXT "{self.val}"'
 
-                elems.append(_Element(obj.get_text(), simple_font(obj.fontname), obj.size))
-                continue
 
-            # join separate chars together
-            prev_elem = elems[-1]
-            if isinstance(prev_elem, _Element) and simple_font(obj.fontname) == prev_elem.font and obj.size == prev_elem.size:
-                prev_elem.text += obj.get_text()
-            else:
-                elems.append(_Element(obj.get_text(), simple_font(obj.fontname), obj.size))
+def _tokenize_line(line):
+    return tokenize_line(line, separators=False)
 
-        elements.append(elems)
 
-    return elements
+def _proccess_pdf(file, workers=1, cache=None, extraction='layout', pages=None):
+    path = Path(file).expanduser()
+    return iter_tokenized_pdf(path, _tokenize_line, _LAPARAMS, workers, extraction, cache, PARSER_VERSION, pages)
 
 
 def _detect_marker_elements(elements):
-    new_elements = []
-
-    for elem in [elem[0] for elem in elements]:
+    for elem in (elem[0] for elem in elements):
         if round(elem.size) == 18.0:
             if elem.text.isnumeric():
-                new_elements.append(_Marker(0, elem.text))
+                yield _Marker(MARKER_CHAPTER, elem.text)
                 continue
             else:
-                new_elements.append(_Marker(1, elem.text))
+                yield _Marker(MARKER_TEXT, elem.text)
                 continue
 
         # ignore page numbers
@@ -92,99 +74,134 @@ def _detect_marker_elements(elements):
             continue
 
         if elem.font == 'MyriadPro-Regular' and round(elem.size) == 16:
-            new_elements.append(elem)
+            yield elem
             continue
 
         raise Exception()
 
-    return new_elements
-
 
-def _clean(elements):
-    new_elements = []
+def _clean(elements, rules):
+    # the last output is held back, as words split over two lines are glued onto it
+    last = None
+    prev = None
+    chapter_starts = rules['chapter_starts']
+    glued_words = rules['glued']
 
-    for i, elem in enumerate(elements):
-        # for B1B2
-        if isinstance(elem, _Element) and elem.text == 'en aktie':
-            new_elements.append(_Marker(0, '2'))
+    for elem in elements:
+        marker = None
 
-        if isinstance(elem, _Element) and elem.text == 'allergisk':
-            new_elements.append(_Marker(0, '4'))
+        # words starting a chapter that has no chapter marker
+        start = chapter_starts.get(elem.text) if isinstance(elem, _Element) else None
+        if start is not None and not (isinstance(prev, _Element) and prev.text == start.get('unless_after')):
+            marker = _Marker(MARKER_CHAPTER, start['chapter'])
 
-        if isinstance(elem, _Element) and elem.text == 'beredd' and not (isinstance(elements[i-1], _Element) and elements[i-1].text == 'behåller'):
-            new_elements.append(_Marker(0, '7'))
+        prev = elem
 
-        if isinstance(elem, _Element) and elem.text == 'alldeles':
-            new_elements.append(_Marker(0, '9'))
+        if marker:
+            if last is not None:
+                yield last
+            last = marker
 
-        if isinstance(elem, _Element) and elem.text.strip() == 'anställningsintervju':
-            new_elements[-1].text = new_elements[-1].text[:-1] + elem.text
+        glued = glued_words.get(elem.text.strip()) if isinstance(elem, _Element) else None
+        if glued is not None and last is not None:
+            last.text = (last.text[:-1] if glued.get('drop_hyphen') else last.text) + elem.text
             continue
 
-        if isinstance(elem, _Element) and elem.text.strip() == 'arbetslivserfarenhet':
-            new_elements[-1].text += elem.text
-            continue
+        if isinstance(elem, _Marker) and elem.type == MARKER_CHAPTER:
+            val = str(int(elem.val))
+            prefix = next((p for p in rules['chapter_prefixes'] if val.startswith(p)), None)
+            if val in rules['chapter_remaps']:
+                elem.val = rules['chapter_remaps'][val]
+            elif prefix is not None:
+                elem.val = val[len(prefix):]
+
+            elif int(val) > rules['max_chapter']:
+                raise Exception()
 
-        # for B2C1
-        if isinstance(elem, _Element) and elem.text.strip() == 'nämnare':
-            new_elements[-1].text += elem.text
+        if last is not None:
+            yield last
+        last = elem
+
+    if last is not None:
+        yield last
+
+
+def _create_pairs(elements, chapter=None, text=None):
+    for elem in elements:
+        if isinstance(elem, _Marker):
+            if elem.type == MARKER_CHAPTER:
+                chapter = elem.val
+            elif elem.type == MARKER_TEXT:
+                text = str(elem.val)
             continue
 
-        if isinstance(elem, _Marker) and elem.type == 0:
-            val = int(elem.val)
-            if val == 44:
-                elem.val = '4'
-            elif val == 45:
-                elem.val = '5'
-            elif val == 46:
-                elem.val = '6'
-            elif str(val).startswith('144'):
-                elem.val = str(val)[3:]
-
-            elif val > 18:
-                raise Exception()
+        if not isinstance(elem, _Element):
+            continue
 
-        new_elements.append(elem)
+        if chapter is None:
+            raise Exception()
 
-    return new_elements
+        yield Pair(chapter, text, elem.text, '')
 
 
-def _create_pairs(elements, translate):
-    pairs = []
+def _markers_before(file, page, element_cache, extraction):
+    # the chapter and text in effect at the start of a page, i.e. the last markers on the pages before it
+    chapter = None
+    text = None
+    lines = tokenized_lines_before(Path(file).expanduser(), _tokenize_line, page, _LAPARAMS, extraction, element_cache,
+                                   PARSER_VERSION)
 
-    for line in [(i, e) for i, e in enumerate(elements)]:
-        if not isinstance(line[1], _Element):
+    for marker in _clean(_detect_marker_elements(lines), _volume_rules(volume_name(file))):
+        if not isinstance(marker, _Marker):
             continue
+        if marker.type == MARKER_CHAPTER:
+            chapter = marker.val
+        else:
+            text = str(marker.val)
+
+    return chapter, text
+
+
+def iter_pairs(file, workers=1, element_cache=None, extraction='layout', pages=None, chapters=None):
+    # untranslated pairs, yielded while the PDF is still being parsed
+    elements = PROFILER.stage('ordkort.tokenize', _proccess_pdf(file, workers, element_cache, extraction, pages))
+    elements = PROFILER.stage('ordkort.detect_markers', _detect_marker_elements(elements))
+    elements = PROFILER.stage('ordkort.clean', _clean(elements, _volume_rules(volume_name(file))))
+    # a page range usually starts in the middle of a chapter
+    chapter, text = _markers_before(file, min(pages), element_cache, extraction) if pages else (None, None)
+    pairs = PROFILER.stage('ordkort.create_pairs', _create_pairs(elements, chapter, text))
 
-        swedish = line[1].text
-        english = ''
+    return select_chapters(pairs, chapters) if chapters else pairs
 
-        if translate:
-            tries = 0
-            while True:
-                try:
-                    english = GoogleTranslator(source='sv', target='en').translate(swedish)
-                    sleep(2)
-                    break
-                except Exception as e:
-                    if tries > 5:
-                        raise e
 
-                    tries += 1
-                    sleep(10)
+def _journal(file, pages, chapters):
+    # a subset keeps its own journal, the whole volume's journal stays usable for --resume
+    return TranslationJournal(subset_file(file, subset_name(pages, chapters)).with_suffix('.journal'))
 
-        chapter = [e for e in elements[:line[0]] if isinstance(e, _Marker) and e.type == 0][-1]
-        text = [e for e in elements[:line[0]] if isinstance(e, _Marker) and e.type == 1]
-        text = None if len(text) == 0 else str(text[-1].val)
 
-        pairs.append(Pair(chapter.val, text, swedish, english))
+def get_pairs(file, translate=True, cache=None, engine=None, resume=False, dictionary=None, workers=1,
+              element_cache=None, extraction='layout', pages=None, chapters=None):
+    pairs = list(iter_pairs(file, workers, element_cache, extraction, pages, chapters))
+
+    if translate:
+        # the translator and its HTTP stack are only loaded when something gets translated
+        from ordkort.translate import translate_pairs
+
+        journal = _journal(file, pages, chapters)
+        with PROFILER.measure('ordkort.translate', len(pairs)):
+            translate_pairs(pairs, cache, engine, journal, resume, dictionary)
 
     return pairs
 
 
-def get_pairs(file, translate=True):
-    elements = _proccess_pdf(file)
-    elements = _detect_marker_elements(elements)
-    elements = _clean(elements)
+def stream_pairs(file, cache=None, engine=None, resume=False, dictionary=None, workers=1, element_cache=None,
+                 extraction='layout', pages=None, chapters=None):
+    # pipelined get_pairs, translated pairs are yielded while the PDF is still being parsed
+    from ordkort.translate import translate_stream
+
+    pairs = iter_pairs(file, workers, element_cache, extraction, pages, chapters)
+    journal = _journal(file, pages, chapters)
+
+    pairs = translate_stream(pairs, cache, engine, journal, resume, dictionary)
 
-    return _create_pairs(elements, translate)
+    return PROFILER.stage('ordkort.translate_stream', pairs)
@@ -0,0 +1,122 @@
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# local stand-in for a translation service, used to test and benchmark the translation stage offline
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+
+        if url.path == '/stats':
+            self._send(200, dict(server.stats))
+            return
+
+        if url.path != '/translate':
+            self._send(404, {'error': 'not found'})
+            return
+
+        with server.lock:
+            server.stats['requests'] += 1
+
+            now = time.monotonic()
+            while server.window and server.window[0] < now - 1:
+                server.window.popleft()
+
+            throttled = server.rate_limit is not None and len(server.window) >= server.rate_limit
+            if throttled:
+                server.stats['throttled'] += 1
+            else:
+                server.window.append(now)
+
+        if throttled:
+            self._send(429, {'error': 'too many requests'})
+            return
+
+        time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.stats['errors'] += 1
+            self._send(500, {'error': 'simulated failure'})
+            return
+
+        text = parse_qs(url.query).get('q', [''])[0]
+        self._send(200, {'translation': server.translate(text)})
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=8765, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=None, dictionary=None):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.dictionary = dictionary if dictionary else {}
+
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0}
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def translate(self, text):
+        # translate each part of a delimited batch on its own, like a real service would
+        return ' ||| '.join(self.dictionary.get(part.strip(), f'{part.strip()} (en)') for part in text.split('|||'))
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _load_dictionary(file):
+    entries = {}
+    with open(file, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) >= 2:
+                entries.setdefault(parts[0].strip(), parts[1].strip())
+    return entries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.05, help='random +/- seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--rate-limit', type=int, help='requests per second before answering with 429')
+    parser.add_argument('--dictionary', help='TSV of swedish/english pairs to answer with')
+    args = parser.parse_args()
+
+    server = StandinServer(args.port, args.latency, args.jitter, args.error_rate, args.rate_limit,
+                           _load_dictionary(args.dictionary) if args.dictionary else None)
+    print(f'serving on {server.url}')
+    server.serve_forever()
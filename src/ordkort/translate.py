@@ -0,0 +1,331 @@
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Empty, Full, Queue
+from time import monotonic, sleep
+
+from ordkort.backends import BATCH_DELIMITER, GoogleBackend
+from profiler import PROFILER
+
+
+class RateLimiter:
+    # token bucket whose rate grows additively on success and halves when the backend pushes back
+    def __init__(self, rate=2.0, min_rate=0.1, max_rate=50.0, increase=0.25):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+
+        self._tokens = 1.0
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            sleep(wait)
+
+    def success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, factor=0.5):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * factor)
+            self._tokens = min(self._tokens, 0.0)
+
+
+def _backoff(tries, base=1.0, cap=30.0):
+    # exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** tries))
+
+
+def _chunks(texts, batch_size, max_chars):
+    chunk = []
+    chars = 0
+
+    for i, text in enumerate(texts):
+        if chunk and (len(chunk) == batch_size or chars + len(BATCH_DELIMITER) + len(text) > max_chars):
+            yield chunk
+            chunk = []
+            chars = 0
+
+        chunk.append(i)
+        chars += len(text) + (len(BATCH_DELIMITER) if chars else 0)
+
+    if chunk:
+        yield chunk
+
+
+class TranslationEngine:
+    def __init__(self, backend=None, workers=4, limiter=None, retries=5, batch_size=1, max_chars=4500):
+        self.backend = backend if backend else GoogleBackend()
+        self.workers = workers
+        self.limiter = limiter if limiter else RateLimiter()
+        self.retries = retries
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+
+    def _call(self, fn, arg):
+        tries = 0
+        while True:
+            if self.backend.remote:
+                waited = monotonic()
+                self.limiter.acquire()
+                PROFILER.observe('translate.limiter_wait', monotonic() - waited)
+
+            PROFILER.count('translate.requests')
+            start = monotonic()
+            try:
+                result = fn(arg)
+                if self.backend.remote:
+                    self.limiter.success()
+                PROFILER.observe('translate.latency', monotonic() - start)
+                return result
+            except Exception as e:
+                PROFILER.observe('translate.failed_latency', monotonic() - start)
+                if tries > self.retries:
+                    PROFILER.count('translate.failures')
+                    raise e
+
+                tries += 1
+                PROFILER.count('translate.retries')
+                if self.backend.remote:
+                    # back off hard when told to slow down, gently on other failures
+                    throttle = self.backend.is_throttle(e)
+                    if throttle:
+                        PROFILER.count('translate.throttled')
+                    self.limiter.throttled(0.5 if throttle else 0.9)
+
+                backoff = _backoff(tries)
+                PROFILER.observe('translate.backoff', backoff)
+                sleep(backoff)
+
+    def _translate_chunk(self, texts):
+        if len(texts) == 1:
+            return [self._call(self.backend.translate, texts[0])]
+
+        translated = self._call(self.backend.translate_batch, texts)
+        if translated is None:
+            # the delimiters did not survive translation, ask for each word separately
+            translated = [self._call(self.backend.translate, text) for text in texts]
+
+        return translated
+
+    def run(self, texts, on_result=None):
+        results = [None] * len(texts)
+
+        pool = ThreadPoolExecutor(self.workers)
+        try:
+            futures = {}
+            for chunk in _chunks(texts, self.batch_size, self.max_chars):
+                futures[pool.submit(self._translate_chunk, [texts[i] for i in chunk])] = chunk
+
+            # results complete out of order, but are stored by index so they come back in card order
+            for future in as_completed(futures):
+                for i, result in zip(futures[future], future.result()):
+                    results[i] = result
+
+                    if on_result:
+                        on_result(i, texts[i], result)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        return results
+
+
+def translate_pairs(pairs, cache=None, engine=None, journal=None, resume=False, dictionary=None):
+    engine = engine if engine else TranslationEngine()
+    # local backends are as cheap as the cache, and a cached miss would hide words added to the dictionary later
+    cache = cache if engine.backend.remote else None
+
+    translations = {}
+    if journal and resume:
+        for index, (swedish, english) in journal.load().items():
+            # only trust entries that still line up with the cards of this run
+            if index < len(pairs) and pairs[index].swedish == swedish:
+                translations[swedish] = english
+
+    first_index = {}
+    for i, pair in enumerate(pairs):
+        if pair.swedish in translations:
+            continue
+
+        # the local dictionary is consulted before any translator
+        english = dictionary.lookup(pair.swedish) if dictionary is not None else None
+
+        if english is None and cache is not None:
+            english = cache.get('sv', 'en', engine.backend.name, pair.swedish)
+
+        translations[pair.swedish] = english
+        first_index[pair.swedish] = i
+
+    misses = [swedish for swedish, english in translations.items() if english is None]
+
+    def store(i, swedish, english):
+        translations[swedish] = english
+        if cache is not None:
+            cache.put('sv', 'en', engine.backend.name, swedish, english)
+        if journal:
+            journal.append(first_index[swedish], swedish, english)
+
+    if journal:
+        journal.open(resume)
+
+    try:
+        engine.run(misses, store)
+    finally:
+        if journal:
+            journal.close()
+
+    for pair in pairs:
+        pair.english = translations[pair.swedish]
+
+    return pairs
+
+
+_DONE = object()
+_QUEUED = object()
+
+
+def _produce(pairs, queue, stop):
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    try:
+        for pair in pairs:
+            if not put(pair):
+                return
+        put(_DONE)
+    except BaseException as e:
+        put(e)
+
+
+def translate_stream(pairs, cache=None, engine=None, journal=None, resume=False, dictionary=None, queue_size=256):
+    # Parsing runs on a producer thread feeding a bounded queue, translations run on the engine's workers and
+    # translated pairs are yielded in card order as soon as they are ready. The queue and the cap on cards waiting
+    # for a translation give backpressure both ways.
+    engine = engine if engine else TranslationEngine()
+    cache = cache if engine.backend.remote else None
+    journaled = journal.load() if journal and resume else {}
+
+    queue = Queue(queue_size)
+    stop = threading.Event()
+    threading.Thread(target=_produce, args=(pairs, queue, stop), daemon=True).start()
+
+    pool = ThreadPoolExecutor(engine.workers)
+    translations = {}
+    first_index = {}
+    pending = deque()
+    batch = []
+
+    def submit():
+        future = pool.submit(engine._translate_chunk, list(batch))
+        for pos, swedish in enumerate(batch):
+            translations[swedish] = (future, pos)
+        batch.clear()
+
+    def ready(swedish):
+        value = translations[swedish]
+        return value is not _QUEUED and (not isinstance(value, tuple) or value[0].done())
+
+    def finish(pair):
+        value = translations[pair.swedish]
+        if value is _QUEUED:
+            submit()
+            value = translations[pair.swedish]
+
+        if isinstance(value, tuple):
+            english = value[0].result()[value[1]]
+            translations[pair.swedish] = english
+
+            if cache is not None:
+                cache.put('sv', 'en', engine.backend.name, pair.swedish, english)
+            if journal:
+                journal.append(first_index[pair.swedish], pair.swedish, english)
+        else:
+            english = value
+
+        pair.english = english
+        return pair
+
+    if journal:
+        journal.open(resume)
+
+    try:
+        index = 0
+        done = False
+
+        while not done:
+            try:
+                item = queue.get(timeout=0.05 if batch or pending else None)
+            except Empty:
+                # the producer is slow, don't let a partial batch wait for it
+                if batch:
+                    submit()
+                item = None
+
+            if item is _DONE:
+                done = True
+                if batch:
+                    submit()
+            elif isinstance(item, BaseException):
+                raise item
+            elif item is not None:
+                if item.swedish not in translations:
+                    entry = journaled.get(index)
+                    # only trust journal entries that still line up with the cards of this run
+                    english = entry[1] if entry and entry[0] == item.swedish else None
+
+                    # the local dictionary is consulted before any translator
+                    if english is None and dictionary is not None:
+                        english = dictionary.lookup(item.swedish)
+
+                    if english is None and cache is not None:
+                        english = cache.get('sv', 'en', engine.backend.name, item.swedish)
+
+                    if english is None:
+                        translations[item.swedish] = _QUEUED
+                        first_index[item.swedish] = index
+                        batch.append(item.swedish)
+
+                        if len(batch) >= engine.batch_size or \
+                                sum(len(t) + len(BATCH_DELIMITER) for t in batch) > engine.max_chars:
+                            submit()
+                    else:
+                        translations[item.swedish] = english
+
+                pending.append(item)
+                index += 1
+
+            # hand out cards in order as soon as their translation is there
+            while pending and ready(pending[0].swedish):
+                yield finish(pending.popleft())
+
+            # too many cards waiting for a translation, or nothing left to read, wait for the oldest one
+            while pending and (done or len(pending) > queue_size):
+                yield finish(pending.popleft())
+    finally:
+        stop.set()
+        pool.shutdown(cancel_futures=True)
+        if journal:
+            journal.close()
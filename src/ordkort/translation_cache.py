@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+
+
+def normalize(text):
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class TranslationCache:
+    def __init__(self, file, max_entries=None, max_age_days=None):
+        self.path = Path(file).expanduser()
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'source TEXT NOT NULL, target TEXT NOT NULL, backend TEXT NOT NULL, text TEXT NOT NULL, '
+            'translation TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL, '
+            'PRIMARY KEY (source, target, backend, text))')
+        self._conn.commit()
+
+        self.evict()
+
+    def get(self, source, target, backend, text):
+        key = (source, target, backend, normalize(text))
+        row = self._conn.execute(
+            'SELECT translation FROM translations WHERE source=? AND target=? AND backend=? AND text=?', key
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._conn.execute(
+            'UPDATE translations SET used=? WHERE source=? AND target=? AND backend=? AND text=?', (time.time(), *key))
+        self._conn.commit()
+        return row[0]
+
+    def put(self, source, target, backend, text, translation):
+        now = time.time()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (source, target, backend, normalize(text), translation, now, now))
+        self._conn.commit()
+
+    def evict(self):
+        if self.max_age_days is not None:
+            self._conn.execute(
+                'DELETE FROM translations WHERE created < ?', (time.time() - self.max_age_days * 86400,))
+
+        if self.max_entries is not None:
+            # keep the most recently used entries
+            self._conn.execute(
+                'DELETE FROM translations WHERE rowid NOT IN '
+                '(SELECT rowid FROM translations ORDER BY used DESC LIMIT ?)', (self.max_entries,))
+
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+
+    def export(self, file):
+        rows = self._conn.execute(
+            'SELECT source, target, backend, text, translation, created FROM translations ORDER BY rowid')
+
+        count = 0
+        with open(Path(file).expanduser(), 'w', encoding='utf-8') as f:
+            for source, target, backend, text, translation, created in rows:
+                f.write(json.dumps({'source': source, 'target': target, 'backend': backend, 'text': text,
+                                    'translation': translation, 'created': created}, ensure_ascii=False) + '\n')
+                count += 1
+
+        return count
+
+    def import_(self, file):
+        now = time.time()
+        rows = []
+
+        with open(Path(file).expanduser(), encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+
+                entry = json.loads(line)
+                rows.append((entry['source'], entry['target'], entry['backend'], normalize(entry['text']),
+                             entry['translation'], entry.get('created', now), now))
+
+        self._conn.executemany('INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        self._conn.commit()
+        self.evict()
+
+        return len(rows)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
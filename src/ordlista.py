@@ -1,15 +1,90 @@
-from ordlista.process_pdf import get_pairs
-from ordlista.deck_creator import create_deck
+import argparse
+import json
+from dataclasses import asdict
 
+from ordlista.process_pdf import Pair, iter_pairs
+from common import parse_pages, subset_file, subset_name
+from element_cache import ElementCache
+from pair_store import PairStore, pairs_file, store_pairs
+from profiler import PROFILER
+
+
+def _build(name, pairs, output, delta, bulk):
+    # genanki is only imported once a deck is built
+    from ordlista.deck_creator import create_deck
+
+    changes = create_deck(name, pairs, output, delta, bulk)
+    print(f'{output}: {changes}' + ('' if changes.written else ', not rewritten'))
+
+
+def _pairs(file, output, from_pairs, workers, element_cache, extraction, pages, chapters):
+    if from_pairs:
+        # the pairs stored by the last build, the PDF isn't read
+        with PairStore(pairs_file(output), Pair) as store:
+            yield from store
+        return
+    yield from store_pairs(pairs_file(output), Pair, iter_pairs(file, workers, element_cache, extraction, pages,
+                                                                chapters))
+
+
+def main(a1_file, b1_file, workers, element_cache, extraction, delta=False, bulk=False, from_pairs=False, pages=None,
+         chapters=None):
+    # a subset of the pages or chapters is written next to the whole deck, with the same deck and note ids
+    subset = subset_name(pages, chapters)
 
-def main(a1_file, b1_file):
     if a1_file:
-        a1_pairs = get_pairs(a1_file)
-        create_deck('Rivstart A1+A2', a1_pairs, 'rivstart_a1a2_ordlista.apkg')
+        a1_output = subset_file('rivstart_a1a2_ordlista.apkg', subset)
+        a1_pairs = _pairs(a1_file, a1_output, from_pairs, workers, element_cache, extraction, pages, chapters)
+        _build('Rivstart A1+A2', a1_pairs, a1_output, delta, bulk)
 
     if b1_file:
-        b1_pairs = get_pairs(b1_file)
-        create_deck('Rivstart B1+B2', b1_pairs, 'rivstart_b1b2_ordlista.apkg')
+        b1_output = subset_file('rivstart_b1b2_ordlista.apkg', subset)
+        b1_pairs = _pairs(b1_file, b1_output, from_pairs, workers, element_cache, extraction, pages, chapters)
+        _build('Rivstart B1+B2', b1_pairs, b1_output, delta, bulk)
+
+
+def print_pairs(files, workers, element_cache, extraction, pages=None, chapters=None):
+    for file in files:
+        for pair in iter_pairs(file, workers, element_cache, extraction, pages, chapters):
+            print(json.dumps(asdict(pair), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--parse-workers', type=int, default=1, help='processes used for PDF layout analysis')
+    parser.add_argument('--parse-cache', default='.parse_cache', help='directory caching parsed PDF elements')
+    parser.add_argument('--no-parse-cache', action='store_true', help='always parse the PDFs from scratch')
+    parser.add_argument('--extraction', choices=['layout', 'fast'], default='layout',
+                        help='full pdfminer layout analysis, or character runs straight from the interpreter')
+    parser.add_argument('--delta', action='store_true', help='also write a package with only the new and changed notes')
+    parser.add_argument('--bulk-writer', action='store_true',
+                        help='write packages with batched inserts instead of genanki, for large decks')
+    parser.add_argument('--pages', type=parse_pages, metavar='RANGES',
+                        help='only parse these pages, e.g. 40-55,60')
+    parser.add_argument('--chapters', type=int, nargs='+', metavar='N',
+                        help='only build these chapters, parsing stops after the last of them')
+    parser.add_argument('--from-pairs', action='store_true',
+                        help='build the decks from the .pairs files of the last build instead of the PDFs')
+    parser.add_argument('--pairs-only', action='store_true',
+                        help='print the parsed pairs as JSON lines instead of building decks')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write per-stage timings, memory and translation stats as JSON')
+    parser.add_argument('--profile-stage', metavar='STAGE',
+                        help='also run cProfile inside this stage, e.g. ordlista.tokenize')
+    parser.add_argument('--profile-dump', metavar='FILE', help='pstats file for the cProfile of --profile-stage')
+    args = parser.parse_args()
+
+    if args.profile:
+        PROFILER.enable(args.profile_stage)
 
+    parse_cache = None if args.no_parse_cache else ElementCache(args.parse_cache)
+    chapters = set(args.chapters) if args.chapters else None
+    if args.pairs_only:
+        print_pairs(['ordlista_a1a2.pdf', 'ordlista_b1b2.pdf'], args.parse_workers, parse_cache, args.extraction,
+                    args.pages, chapters)
+    else:
+        main('ordlista_a1a2.pdf', 'ordlista_b1b2.pdf', args.parse_workers, parse_cache, args.extraction, args.delta,
+             args.bulk_writer, args.from_pairs, args.pages, chapters)
 
-main('ordlista_a1a2.pdf', 'ordlista_b1b2.pdf')
+    if args.profile:
+        PROFILER.write(args.profile, args.profile_dump)
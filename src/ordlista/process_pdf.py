@@ -1,11 +1,16 @@
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from pdfminer.high_level import extract_pages
-from pdfminer.layout import  LTChar, LTAnno
 from typing import List, Tuple
 
-from common import extract_text, simple_font
+from common import SEPARATOR_EMPTY, SEPARATOR_NEWLINE, SEPARATOR_SPACE, Element, Marker, Separator, \
+    iter_tokenized_pdf, select_chapters, tokenize_line, tokenized_lines_before
+from layout_rules import RuleIndex, load_rules, volume_name
+from profiler import PROFILER
+
+# bump when the tokenization changes, invalidates the parsed element cache
+PARSER_VERSION = 1
 
 
 @dataclass
@@ -17,105 +22,59 @@ class Pair:
     english: str
 
 
-@dataclass
-class _Element:
-    text: str
-    font: str
-    size: float
+_Element = Element
+_Separator = Separator
 
-    def __repr__(self):
-        return f'{self.text} [{self.font}]'
+MARKER_CHAPTER = 0
+MARKER_PAGE = 1
+MARKER_CLASS = 2
 
+# layout exceptions of the printed volumes, a new edition adds a file to rules/
+_RULES_DIRECTORY = Path(__file__).parent / 'rules'
 
-@dataclass
-class _Separator:
-    type: int
 
-    def __repr__(self):
-        if self.type == 0:
-            return 'ANNO NL'
-        elif self.type == 1:
-            return 'ANNO SP'
-        elif self.type == 2:
-            return 'EMPTY'
+@lru_cache(maxsize=None)
+def _volume_rules(volume):
+    rules = load_rules(_RULES_DIRECTORY, volume)
+    return {
+        # lines that continue the previous one even though they look like a line of their own
+        'continuations': RuleIndex(rules.get('continuations', [])),
+        # lines replaced by fixed pairs
+        'replacements': RuleIndex(rules.get('replacements', [])),
+    }
 
 
-@dataclass
-class _Marker:
-    type: int
-    val: int
+class _Marker(Marker):
+    __slots__ = ()
 
     def __repr__(self):
-        if self.type == 0:
+        if self.type == MARKER_CHAPTER:
             return f'MARKER CHAPTER {self.val}'
-        elif self.type == 1:
+        elif self.type == MARKER_PAGE:
             return f'MARKER PAGE {self.val}'
-        elif self.type == 2:
+        elif self.type == MARKER_CLASS:
             return 'MARKER CLASS'
 
 
-def _proccess_pdf(file):
-    path = Path(file).expanduser()
-    pages = extract_pages(path)
-    lines = extract_text(pages)
-
-    elements = []
-
-    for line in lines:
-        elems = []
-
-        for obj in line:
-            # only expect LTChar or LTAnno
-            if not isinstance(obj, LTChar | LTAnno):
-                raise Exception()
-
-            # extract first element
-            if len(elems) == 0:
-                # we always expect a normal char element
-                if not isinstance(obj, LTChar):
-                    raise Exception()
-
-                elems.append(_Element(obj.get_text(), simple_font(obj.fontname), obj.size))
-                continue
-
-            # LTAnno objs should always be separators
-            if isinstance(obj, LTAnno):
-                if obj.get_text() == ' ':
-                    elems.append(_Separator(1))
-                elif obj.get_text() == '\n':
-                    elems.append(_Separator(0))
-                else:
-                    raise Exception()
-                continue
-
-            # if char is only blank space treat as separator
-            if len(obj.get_text().strip()) == 0:
-                elems.append(_Separator(2))
-                continue
+def _tokenize_line(line):
+    return tokenize_line(line, separators=True)
 
-            # join separate chars together
-            prev_elem = elems[-1]
-            if isinstance(prev_elem, _Element) and simple_font(obj.fontname) == prev_elem.font and obj.size == prev_elem.size:
-                prev_elem.text += obj.get_text()
-            else:
-                elems.append(_Element(obj.get_text(), simple_font(obj.fontname), obj.size))
 
-        elements.append(elems)
-    return elements
+def _proccess_pdf(file, workers=1, cache=None, extraction='layout', pages=None):
+    path = Path(file).expanduser()
+    return iter_tokenized_pdf(path, _tokenize_line, {}, workers, extraction, cache, PARSER_VERSION, pages)
 
 
 def _detect_marker_elems(elements):
-    new_elements = []
-
     for line in elements:
         first_elem = line[0]
 
         if first_elem.text.startswith('Klassrumsfraser'):
-            new_elements.append(_Marker(2, -1))
+            yield _Marker(MARKER_CLASS, -1)
 
         elif first_elem.text.startswith('Kapitel'):
             number = int([e for e in line if isinstance(e, _Element) and e.text.isnumeric()][0].text)
-            new_elements.append(_Marker(0, number))
+            yield _Marker(MARKER_CHAPTER, number)
 
         elif first_elem.text.startswith('Sidan'):
             # cover case where page number has no space
@@ -124,16 +83,14 @@ def _detect_marker_elems(elements):
                 number = int(match.group(1))
             else:
                 number = int([e for e in line if isinstance(e, _Element) and e.text.isnumeric()][0].text)
-            new_elements.append(_Marker(1, number))
+            yield _Marker(MARKER_PAGE, number)
 
         elif first_elem.text.startswith(('A1+A2', 'B1+B2')):
             # ignore
             continue
 
         else:
-            new_elements.append(line)
-
-    return new_elements
+            yield line
 
 
 def _join_similar(line, has_anno_spacing, space=True):
@@ -169,7 +126,7 @@ def _join_similar(line, has_anno_spacing, space=True):
 
 
 def _remove_end_empty(line):
-    while isinstance(line[-1], _Separator) and line[-1].type in [0, 2]:
+    while isinstance(line[-1], _Separator) and line[-1].type in [SEPARATOR_NEWLINE, SEPARATOR_EMPTY]:
         line = line[:-1]
     return line
 
@@ -177,18 +134,17 @@ def _remove_end_empty(line):
 def _cleanup_lines(elements):
     store = None
 
-    new_elements = []
     for line in elements:
         # ignore already processed lines
         if not isinstance(line, List):
-            new_elements.append(line)
+            yield line
             continue
 
         # remove empty and new-line characters from end
         line = _remove_end_empty(line)
 
-        anno_spacing = len([a for a in line if isinstance(a, _Separator) and a.type == 1])
-        space_spacing = len([a for a in line if isinstance(a, _Separator) and a.type == 2])
+        anno_spacing = len([a for a in line if isinstance(a, _Separator) and a.type == SEPARATOR_SPACE])
+        space_spacing = len([a for a in line if isinstance(a, _Separator) and a.type == SEPARATOR_EMPTY])
 
         if anno_spacing > 0 or space_spacing > 0:
             new_line = _join_similar(line, anno_spacing > 0)
@@ -196,10 +152,10 @@ def _cleanup_lines(elements):
             # remove consecutive repeated elements
             clean = [v for i, v in enumerate(new_line) if i == 0 or v != new_line[i - 1]]
 
-            new_elements.append(_remove_end_empty(clean))
+            yield _remove_end_empty(clean)
 
             if store:
-                new_elements.append(store)
+                yield store
                 store = None
 
         else:
@@ -212,77 +168,58 @@ def _cleanup_lines(elements):
                 store = [e for e in line if len(e.text.strip()) > 0]
                 continue
 
-            new_elements.append(line)
+            yield line
 
-    return new_elements
 
+def _is_continuation(line, continuations):
+    # lines the rules mark as continuations, otherwise two-liners usually have one element, or have two and a closing
+    # parenthesis
+    return continuations.lookup(line) is not None or len(line) <= 1 or (len(line) == 2 and line[1].text == ')')
 
-def _condensate_two_liners(elements):
-    new_elements = []
 
-    for line in elements:
-        if not isinstance(line, List):
-            new_elements.append(line)
-            continue
+def _condensate_two_liners(elements, rules):
+    # only the previous line is held back, a two-liner continuation is merged into it
+    prev = None
+    continuations = rules['continuations']
 
-        # weird exception
-        is_one_liner = len(line) == 5 and line[4].text.startswith('actress') \
-            or line[0].text.startswith('have you/has (') \
-            or len(line) == 5 and line[0].text == 'nen' \
-            or len(line) == 6 and line[0].text == 'massmediet, massmedier, massmedierna' \
-            or len(line) == 5 and line[0].text == 'na' and line[4].text == 'art museum'\
-            or len(line) == 5 and line[0].text == 'na' and line[4].text.startswith('path,')\
-            or len(line) == 5 and line[0].text == 'stämt' and line[4].text.startswith('conform,')\
-            or len(line) == 5 and line[0].text == 'na' and 'grandmother, step grandmother' in line[4].text
-
-        # two-liners usually have one element, or have two and a closing parenthesis
-        if not is_one_liner and len(line) > 1 and not (len(line) == 2 and line[1].text == ')'):
-            new_elements.append(line)
+    for line in elements:
+        if not isinstance(line, List) or not _is_continuation(line, continuations):
+            if prev is not None:
+                yield prev
+            prev = line
             continue
 
-        last_inserted_elem = new_elements[-1][-1]
+        last_inserted_elem = prev[-1]
 
         # remove new line hyphen on previous line
         if last_inserted_elem.text.endswith('-'):
             last_inserted_elem.text = last_inserted_elem.text[:-1]
-            new_elements[-1] = _join_similar(new_elements[-1] + line, True, False)
+            prev = _join_similar(prev + line, True, False)
         else:
-            new_elements[-1] = _join_similar(new_elements[-1] + [_Separator(2)] + line, True)
+            prev = _join_similar(prev + [_Separator(SEPARATOR_EMPTY)] + line, True)
 
-    return new_elements
+    if prev is not None:
+        yield prev
 
 
-def _final_join(elements):
-    new_elements = []
+def _final_join(elements, rules):
+    replacements = rules['replacements']
+
     for line in elements:
         if not isinstance(line, List):
-            new_elements.append(line)
+            yield line
             continue
 
         to_store = []
 
-        # weird exceptions
-        if line[0].text.startswith('köra (') and len(line) > 7 and isinstance(line[6], _Element) and line[6].text.startswith('in running, i.e'):
-            to_store.append(([_Element('köra (kör, körde, kört)', '', 0)],
-                             [_Element('to cover (in running, i.e ”to cover a mile”)', '', 0)]))
-
-        elif line[0].text.startswith('Jag skriver till er f'):
-            to_store.append(([_Element('Jag skriver till er för att...', '', 0)],
-                             [_Element('I am writing to you in order to...', '', 0)]))
-
-            to_store.append(([_Element('Anledningen till att jag skriver är...', '', 0)],
-                             [_Element('The reason I’m writing/write is...', '', 0)]))
-
-        elif line[0].text.startswith('jag har alltid varit intresserad'):
-            to_store.append(([_Element('jag har alltid varit intresserad av...', '', 0)],
-                             [_Element('I have always been interested in...', '', 0)]))
-
-            to_store.append(([_Element('jag är mycket intresserad av...', '', 0)],
-                             [_Element('I am very interested in...', '', 0)]))
-
+        # lines the layout garbles beyond repair, the rule holds the finished pairs
+        replacement = replacements.lookup(line)
+        if replacement is not None:
+            for swedish, english in replacement['pairs']:
+                to_store.append(([_Element(swedish, '', 0)], [_Element(english, '', 0)]))
         else:
             # if there is an ANNO SP use that
-            s = [(i, e) for i, e in enumerate(line) if isinstance(e, _Separator) and e.type == 1]
+            s = [(i, e) for i, e in enumerate(line) if isinstance(e, _Separator) and e.type == SEPARATOR_SPACE]
             if len(s) > 0:
                 pos = s[0][0]
             else:
@@ -310,42 +247,42 @@ def _final_join(elements):
                 else:
                     part2 += e.text
 
-            new_elements.append((part1.strip(), part2.strip()))
-
-    return new_elements
+            yield (part1.strip(), part2.strip())
 
 
 def _clean(elements):
-    new_elements = []
-
     for line in elements:
         if not isinstance(line, Tuple):
-            new_elements.append(line)
+            yield line
             continue
 
         # happens when english part has spaces
         if line[1].strip().startswith(')'):
-            new_elements.append((line[0] + ')', line[1].strip()[1:].strip()))
+            yield (line[0] + ')', line[1].strip()[1:].strip())
             continue
 
         if len(line) == 1:
             raise Exception()
 
-        new_elements.append(line)
-
-    return new_elements
+        yield line
 
 
-def _create_pairs(elements):
-    pairs = []
+def _create_pairs(elements, chapter=None, page=None):
+    for line in elements:
+        if isinstance(line, _Marker):
+            if line.type in (MARKER_CHAPTER, MARKER_CLASS):
+                chapter = line
+            elif line.type == MARKER_PAGE:
+                # can be start-of-chapter undefined page as well
+                page = str(line.val)
+            continue
 
-    for line in [(i, e) for i, e in enumerate(elements)]:
-        if not isinstance(line[1], Tuple):
+        if not isinstance(line, Tuple):
             continue
 
-        swedish = line[1][0]
+        swedish = line[0]
         swedish_conjugation = None
-        english = line[1][1]
+        english = line[1]
 
         if '(' in swedish and ')' in swedish:
             match = re.match(r'(.*)\((.*)\)(.*)', swedish)
@@ -359,29 +296,52 @@ def _create_pairs(elements):
         if bool('(' in swedish) ^ bool(')' in swedish) or bool('(' in english) ^ bool(')' in english):
             raise Exception()
 
-        chapter = [e for e in elements[:line[0]] if isinstance(e, _Marker) and e.type in (0, 2)][-1]
+        if chapter is None:
+            raise Exception()
 
         # handle special classroom phrases
-        if chapter.type == 2:
-            pairs.append(Pair(None, None, swedish, swedish_conjugation, english))
+        if chapter.type == MARKER_CLASS:
+            yield Pair(None, None, swedish, swedish_conjugation, english)
             continue
 
-        # get page; can be start-of-chapter undefined page as well
-        page = [e for e in elements[:line[0]] if isinstance(e, _Marker) and e.type == 1]
-        page = None if len(page) == 0 else str(page[-1].val)
+        yield Pair(str(chapter.val), page, swedish, swedish_conjugation, english)
+
+
+def _markers_before(file, page, element_cache, extraction):
+    # the chapter marker and page number in effect at the start of a page, i.e. the last ones on the pages before it
+    chapter = None
+    number = None
+    lines = tokenized_lines_before(Path(file).expanduser(), _tokenize_line, page, {}, extraction, element_cache,
+                                   PARSER_VERSION)
+
+    for marker in _detect_marker_elems(lines):
+        if not isinstance(marker, _Marker):
+            continue
+        if marker.type == MARKER_PAGE:
+            number = str(marker.val)
+        else:
+            chapter = marker
+
+    return chapter, number
+
 
-        pairs.append(Pair(str(chapter.val), page, swedish, swedish_conjugation, english))
+def iter_pairs(file, workers=1, element_cache=None, extraction='layout', pages=None, chapters=None):
+    # every stage is a generator, pairs come out while the PDF is still being parsed
+    rules = _volume_rules(volume_name(file))
+    elements = PROFILER.stage('ordlista.tokenize', _proccess_pdf(file, workers, element_cache, extraction, pages))
 
-    return pairs
+    elements = PROFILER.stage('ordlista.detect_markers', _detect_marker_elems(elements))
+    elements = PROFILER.stage('ordlista.cleanup_lines', _cleanup_lines(elements))
+    elements = PROFILER.stage('ordlista.condensate_two_liners', _condensate_two_liners(elements, rules))
+    elements = PROFILER.stage('ordlista.final_join', _final_join(elements, rules))
+    elements = PROFILER.stage('ordlista.clean', _clean(elements))
 
+    # a page range usually starts in the middle of a chapter
+    chapter, page = _markers_before(file, min(pages), element_cache, extraction) if pages else (None, None)
+    pairs = PROFILER.stage('ordlista.create_pairs', _create_pairs(elements, chapter, page))
 
-def get_pairs(file):
-    elements = _proccess_pdf(file)
+    return select_chapters(pairs, chapters) if chapters else pairs
 
-    elements = _detect_marker_elems(elements)
-    elements = _cleanup_lines(elements)
-    elements = _condensate_two_liners(elements)
-    elements = _final_join(elements)
-    elements = _clean(elements)
 
-    return _create_pairs(elements)
+def get_pairs(file, workers=1, element_cache=None, extraction='layout', pages=None, chapters=None):
+    return list(iter_pairs(file, workers, element_cache, extraction, pages, chapters))
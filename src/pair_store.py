@@ -0,0 +1,190 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from dataclasses import fields
+from itertools import repeat
+from pathlib import Path
+
+
+# Columnar file of the pairs a deck was built from, so decks can be rebuilt without parsing or translating again.
+# After a magic and the header length comes a JSON header, then the columns back to back. chapter, page and text
+# repeat a lot and are interned: a table in the header plus one index per pair. The other fields are a UTF-8 blob
+# with an end offset per pair and, when a value is missing, a byte per pair marking it. The file is memory-mapped
+# and a value is only decoded once it is accessed.
+
+
+MAGIC = b'RSPAIRS1'
+INTERNED = ('chapter', 'page', 'text')
+
+
+def pairs_file(output):
+    return Path(output).expanduser().with_suffix('.pairs')
+
+
+def _pad(data):
+    # keeps every column aligned for memoryview.cast
+    return data + b'\0' * (-len(data) % 4)
+
+
+def write_pairs(file, pair_type, pairs):
+    names = [f.name for f in fields(pair_type)]
+    tables = {name: {} for name in names if name in INTERNED}
+    indexes = {name: array('I') for name in tables}
+    ends = {name: array('I') for name in names if name not in tables}
+    nulls = {name: bytearray() for name in ends}
+    blobs = {name: bytearray() for name in ends}
+    count = 0
+
+    for pair in pairs:
+        count += 1
+        for name in names:
+            value = getattr(pair, name)
+            if name in tables:
+                table = tables[name]
+                indexes[name].append(table.setdefault(value, len(table)))
+            else:
+                nulls[name].append(value is None)
+                if value is not None:
+                    blobs[name] += value.encode('utf-8')
+                ends[name].append(len(blobs[name]))
+
+    segments = []
+    columns = {}
+
+    def add(data):
+        offset = sum(len(s) for s in segments)
+        segments.append(_pad(bytes(data)))
+        return [offset, len(data)]
+
+    for name in names:
+        if name in tables:
+            columns[name] = {'index': add(indexes[name].tobytes())}
+        else:
+            columns[name] = {'ends': add(ends[name].tobytes()), 'blob': add(blobs[name])}
+            if any(nulls[name]):
+                columns[name]['nulls'] = add(nulls[name])
+
+    header = json.dumps({
+        'type': pair_type.__name__,
+        'fields': names,
+        'count': count,
+        'byteorder': sys.byteorder,
+        'tables': {name: list(table) for name, table in tables.items()},
+        'columns': columns,
+    }, ensure_ascii=False).encode('utf-8')
+    header = _pad(header)
+
+    file = Path(file).expanduser()
+    tmp = file.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for segment in segments:
+            f.write(segment)
+    tmp.replace(file)
+
+
+def store_pairs(file, pair_type, pairs):
+    # passes the pairs through and writes them once all of them were consumed
+    kept = []
+    for pair in pairs:
+        kept.append(pair)
+        yield pair
+
+    write_pairs(file, pair_type, kept)
+
+
+class PairStore:
+    def __init__(self, file, pair_type):
+        self.file = Path(file).expanduser()
+        self.pair_type = pair_type
+
+        with open(self.file, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise Exception(f'{self.file} is not a pair store')
+
+        size, = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._mmap[start:start + size].rstrip(b'\0'))
+
+        if header['fields'] != [f.name for f in fields(pair_type)] or header['byteorder'] != sys.byteorder:
+            self._mmap.close()
+            raise Exception(f'{self.file} holds {header["type"]} pairs with fields {header["fields"]}')
+
+        self.count = header['count']
+        self.fields = header['fields']
+        self.tables = header['tables']
+
+        view = memoryview(self._mmap)[start + size:]
+        self._views = [view]
+        self._columns = {name: {key: self._segment(view, offset, length, key in ('index', 'ends'))
+                                for key, (offset, length) in column.items()}
+                         for name, column in header['columns'].items()}
+
+    def _segment(self, view, offset, length, offsets):
+        segment = view[offset:offset + length]
+        self._views.append(segment)
+        if offsets:
+            segment = segment.cast('I')
+            self._views.append(segment)
+        return segment
+
+    def value(self, name, i):
+        column = self._columns[name]
+        if 'index' in column:
+            return self.tables[name][column['index'][i]]
+
+        nulls = column.get('nulls')
+        if nulls is not None and nulls[i]:
+            return None
+
+        ends = column['ends']
+        return str(column['blob'][ends[i - 1] if i else 0:ends[i]], 'utf-8')
+
+    def values(self, name):
+        # a whole column in order, cheaper than value() per pair
+        column = self._columns[name]
+        if 'index' in column:
+            table = self.tables[name]
+            for i in column['index']:
+                yield table[i]
+            return
+
+        blob = column['blob']
+        nulls = column.get('nulls', repeat(0))
+        start = 0
+        for end, null in zip(column['ends'], nulls):
+            yield None if null else str(blob[start:end], 'utf-8')
+            start = end
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not -self.count <= i < self.count:
+            raise IndexError(i)
+        i %= self.count
+        return self.pair_type(*(self.value(name, i) for name in self.fields))
+
+    def __iter__(self):
+        return map(self.pair_type, *(self.values(name) for name in self.fields))
+
+    def close(self):
+        # views into the map have to be released before it can be closed
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._columns = {}
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,260 @@
+import bisect
+import cProfile
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+# Per-stage timings for the parsing pipelines and deck writing. Disabled by default, stages are then passed through
+# untouched. Generator stages are timed around each next(), time spent in stages nested inside another one (e.g. the
+# stage a generator pulls from) is subtracted from the outer stage's own time. tracemalloc keeps one peak for the whole
+# process, so whenever a stage starts or stops the peak so far is handed to every stage still running, in any thread,
+# and reset. A stage's peak_memory is then the most memory traced at any point while it ran.
+
+
+HISTOGRAM_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class _Stats:
+    __slots__ = ('calls', 'items', 'wall', 'cpu', 'upstream_wall', 'upstream_cpu', 'memory')
+
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.upstream_wall = 0.0
+        self.upstream_cpu = 0.0
+        self.memory = 0
+
+    def to_json(self):
+        return {
+            'calls': self.calls,
+            'items': self.items,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'self_wall': self.wall - self.upstream_wall,
+            'self_cpu': self.cpu - self.upstream_cpu,
+            'peak_memory': self.memory,
+        }
+
+
+class _Peak:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def to_json(self):
+        count = sum(self.counts)
+        return {
+            'buckets': HISTOGRAM_BUCKETS + ['inf'],
+            'counts': self.counts,
+            'count': count,
+            'mean': self.total / count if count else 0.0,
+            'max': self.max,
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.hot_stage = None
+        self.cprofile = None
+        self.stages = {}
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._active = threading.local()
+        self._start = None
+        self._memory = False
+        self._open = set()
+        self._peak = 0
+
+    def enable(self, hot_stage=None, memory=True):
+        # starts a new profile, tracing allocations slows everything down so it can be left off for timings
+        self.enabled = True
+        self.hot_stage = hot_stage
+        self.cprofile = cProfile.Profile() if hot_stage else None
+        self.stages = {}
+        self.counters = {}
+        self.histograms = {}
+        self._start = time.perf_counter()
+        self._memory = memory
+        self._open = set()
+        self._peak = 0
+        if memory:
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        self._memory = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _fold_peak(self):
+        # called with the lock held
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._open:
+            if peak > frame.value:
+                frame.value = peak
+        self._peak = max(self._peak, peak)
+        tracemalloc.reset_peak()
+
+    def _enter(self, stats):
+        stack = getattr(self._active, 'stack', None)
+        if stack is None:
+            stack = self._active.stack = []
+
+        peak = None
+        if self._memory:
+            peak = _Peak()
+            with self._lock:
+                self._fold_peak()
+                self._open.add(peak)
+        stack.append((stats, peak))
+
+    def _exit(self, wall, cpu):
+        stack = self._active.stack
+        stats, peak = stack.pop()
+        stats.wall += wall
+        stats.cpu += cpu
+        if stack:
+            stack[-1][0].upstream_wall += wall
+            stack[-1][0].upstream_cpu += cpu
+
+        if peak is not None:
+            with self._lock:
+                self._fold_peak()
+                self._open.discard(peak)
+            stats.memory = max(stats.memory, peak.value)
+
+    def _stats(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = _Stats()
+        return stats
+
+    def stage(self, name, iterable):
+        if not self.enabled:
+            return iterable
+        return _Stage(self, name, iterable)
+
+    @contextmanager
+    def measure(self, name, items=None):
+        if not self.enabled:
+            yield
+            return
+
+        stats = self._stats(name)
+        hot = self.cprofile is not None and name == self.hot_stage
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        self._enter(stats)
+        if hot:
+            self.cprofile.enable()
+        try:
+            yield
+        finally:
+            if hot:
+                self.cprofile.disable()
+            self._exit(time.perf_counter() - wall, time.process_time() - cpu)
+
+            stats.calls += 1
+            stats.items += items if items is not None else 0
+
+    def items(self, name, n):
+        # for measured blocks that only know how many items they handled once they are done
+        if not self.enabled:
+            return
+        self._stats(name).items += n
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = _Histogram()
+            histogram.add(value)
+
+    def report(self):
+        return {
+            'wall': time.perf_counter() - self._start if self._start is not None else 0.0,
+            'peak_memory': max(self._peak, tracemalloc.get_traced_memory()[1]) if tracemalloc.is_tracing() else None,
+            # kilobytes on Linux
+            'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+            'stages': {name: stats.to_json() for name, stats in self.stages.items()},
+            'counters': dict(self.counters),
+            'histograms': {name: histogram.to_json() for name, histogram in self.histograms.items()},
+        }
+
+    def write(self, file, dump=None):
+        with open(Path(file).expanduser(), 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+        if dump and self.cprofile is not None:
+            self.cprofile.dump_stats(Path(dump).expanduser())
+
+
+class _Stage:
+    # times every next() of the wrapped iterable
+    def __init__(self, profiler, name, iterable):
+        self.profiler = profiler
+        self.stats = profiler._stats(name)
+        self.iterator = iter(iterable)
+        self.hot = profiler.cprofile is not None and name == profiler.hot_stage
+        self.stats.calls += 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        stats = self.stats
+        profiler = self.profiler
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        profiler._enter(stats)
+        if self.hot:
+            profiler.cprofile.enable()
+        try:
+            item = next(self.iterator)
+        finally:
+            if self.hot:
+                profiler.cprofile.disable()
+            profiler._exit(time.perf_counter() - wall, time.process_time() - cpu)
+
+        stats.items += 1
+        return item
+
+
+PROFILER = Profiler()
@@ -0,0 +1,36 @@
+import argparse
+import sys
+
+from ordkort.process_pdf import _proccess_pdf as process_ordkort
+from ordlista.process_pdf import _proccess_pdf as process_ordlista
+
+
+# compares the fast extraction engine with the full layout analysis on real PDFs
+
+
+def compare(file, process):
+    layout = list(process(file, extraction='layout'))
+    fast = list(process(file, extraction='fast'))
+
+    for i, (a, b) in enumerate(zip(layout, fast)):
+        if a != b:
+            print(f'{file}: line {i} differs\n  layout: {a}\n  fast:   {b}')
+            return False
+
+    if len(layout) != len(fast):
+        print(f'{file}: {len(layout)} lines with layout, {len(fast)} with fast')
+        return False
+
+    print(f'{file}: {len(layout)} lines identical')
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ordlista', nargs='*', default=[], help='ordlista PDFs')
+    parser.add_argument('--ordkort', nargs='*', default=[], help='ordkort PDFs')
+    args = parser.parse_args()
+
+    results = [compare(f, process_ordlista) for f in args.ordlista] \
+        + [compare(f, process_ordkort) for f in args.ordkort]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,142 @@
+import re
+
+import pytest
+
+from ordkort import process_pdf as ordkort
+from ordlista import process_pdf as ordlista
+from synthetic_pdf import generate_ordkort, generate_ordlista
+
+
+# the pair creation before it became a single pass, every pair looked back over all elements for its markers
+
+
+def _ordlista_reference(elements):
+    pairs = []
+
+    for line in [(i, e) for i, e in enumerate(elements)]:
+        if not isinstance(line[1], tuple):
+            continue
+
+        swedish = line[1][0]
+        swedish_conjugation = None
+        english = line[1][1]
+
+        if '(' in swedish and ')' in swedish:
+            match = re.match(r'(.*)\((.*)\)(.*)', swedish)
+            swedish = ' '.join((match.group(1) + ' ' + match.group(3)).strip().split())
+            swedish_conjugation = ' '.join(match.group(2).strip().split())
+
+        chapter = [e for e in elements[:line[0]] if isinstance(e, ordlista._Marker) and e.type in (0, 2)][-1]
+
+        if chapter.type == 2:
+            pairs.append(ordlista.Pair(None, None, swedish, swedish_conjugation, english))
+            continue
+
+        page = [e for e in elements[:line[0]] if isinstance(e, ordlista._Marker) and e.type == 1]
+        page = None if len(page) == 0 else str(page[-1].val)
+
+        pairs.append(ordlista.Pair(str(chapter.val), page, swedish, swedish_conjugation, english))
+
+    return pairs
+
+
+def _ordkort_reference(elements):
+    pairs = []
+
+    for line in [(i, e) for i, e in enumerate(elements)]:
+        if not isinstance(line[1], ordkort._Element):
+            continue
+
+        chapter = [e for e in elements[:line[0]] if isinstance(e, ordkort._Marker) and e.type == 0][-1]
+        text = [e for e in elements[:line[0]] if isinstance(e, ordkort._Marker) and e.type == 1]
+        text = None if len(text) == 0 else str(text[-1].val)
+
+        pairs.append(ordkort.Pair(chapter.val, text, line[1].text, ''))
+
+    return pairs
+
+
+def _ordlista_stream():
+    marker = ordlista._Marker
+    return [
+        marker(ordlista.MARKER_CHAPTER, 1),
+        ('hej', 'hello'),
+        marker(ordlista.MARKER_PAGE, 8),
+        ('en bil (bilen, bilar)', 'a car'),
+        ordlista._Separator(ordlista.SEPARATOR_NEWLINE),
+        ('springa (springer, sprang)', 'run'),
+        marker(ordlista.MARKER_PAGE, 9),
+        marker(ordlista.MARKER_CHAPTER, 2),
+        ('tack', 'thanks (informal)'),
+        marker(ordlista.MARKER_CLASS, None),
+        ('räck upp handen', 'raise your hand'),
+        marker(ordlista.MARKER_CHAPTER, 3),
+        ('ja', 'yes'),
+        marker(ordlista.MARKER_PAGE, 14),
+        ('nej', 'no'),
+    ]
+
+
+def _ordkort_stream():
+    marker = ordkort._Marker
+    element = ordkort._Element
+    return [
+        marker(ordkort.MARKER_CHAPTER, '1'),
+        element('en hund', 'Font', 10),
+        marker(ordkort.MARKER_TEXT, 'Text 1A'),
+        element('en katt', 'Font', 10),
+        element('springa', 'Font', 10),
+        marker(ordkort.MARKER_CHAPTER, '2'),
+        element('tack', 'Font', 10),
+        marker(ordkort.MARKER_TEXT, 'Text 2A'),
+        marker(ordkort.MARKER_TEXT, 'Text 2B'),
+        element('ja', 'Font', 10),
+        marker(ordkort.MARKER_CHAPTER, '3'),
+        element('nej', 'Font', 10),
+    ]
+
+
+def test_ordlista_create_pairs():
+    elements = _ordlista_stream()
+    pairs = list(ordlista._create_pairs(iter(elements)))
+
+    assert pairs == _ordlista_reference(elements)
+    assert [(p.chapter, p.page) for p in pairs] == [
+        ('1', None), ('1', '8'), ('1', '8'), ('2', '9'), (None, None), ('3', '9'), ('3', '14')]
+
+
+def test_ordkort_create_pairs():
+    elements = _ordkort_stream()
+    pairs = list(ordkort._create_pairs(iter(elements)))
+
+    assert pairs == _ordkort_reference(elements)
+    assert [(p.chapter, p.text) for p in pairs] == [
+        ('1', None), ('1', 'Text 1A'), ('1', 'Text 1A'), ('2', 'Text 1A'), ('2', 'Text 2B'), ('3', 'Text 2B')]
+
+
+@pytest.mark.parametrize('create_pairs', [ordlista._create_pairs, ordkort._create_pairs])
+def test_create_pairs_needs_a_chapter(create_pairs):
+    with pytest.raises(Exception):
+        list(create_pairs([('hej', 'hello'), ordkort._Element('hej', 'Font', 10)]))
+
+
+def test_ordlista_create_pairs_on_pdf(tmp_path):
+    file = tmp_path / 'ordlista_a1a2.pdf'
+    generate_ordlista(file, pages=8)
+
+    rules = ordlista._volume_rules('a1a2')
+    elements = ordlista._proccess_pdf(file, 1, None, 'layout', None)
+    elements = ordlista._cleanup_lines(ordlista._detect_marker_elems(elements))
+    elements = list(ordlista._clean(ordlista._final_join(ordlista._condensate_two_liners(elements, rules), rules)))
+
+    assert list(ordlista._create_pairs(iter(elements))) == _ordlista_reference(elements)
+
+
+def test_ordkort_create_pairs_on_pdf(tmp_path):
+    file = tmp_path / 'ordkort_b1b2.pdf'
+    generate_ordkort(file, pages=8)
+
+    elements = ordkort._proccess_pdf(file, 1, None, 'layout', None)
+    elements = list(ordkort._clean(ordkort._detect_marker_elements(elements), ordkort._volume_rules('b1b2')))
+
+    assert list(ordkort._create_pairs(iter(elements))) == _ordkort_reference(elements)
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import tempfile
+import zipfile
+
+import pytest
+
+from deck_writer import delta_file, write_decks
+from ordkort.deck_creator import build_deck, create_deck
+from ordkort.process_pdf import Pair
+
+
+def _pairs(english):
+    return [Pair('1', None, 'en hund', 'a dog'), Pair('1', None, 'en katt', english)]
+
+
+def test_delta_holds_changed_notes_and_is_removed_when_nothing_changed(tmp_path):
+    output = tmp_path / 'deck.apkg'
+
+    assert create_deck('Deck', _pairs('a cat'), output, delta=True).written
+    create_deck('Deck', _pairs('a kitten'), output, delta=True)
+    assert delta_file(output).exists()
+
+    changes = create_deck('Deck', _pairs('a kitten'), output, delta=True)
+    assert not changes.written
+    assert not delta_file(output).exists()
+
+
+def _notes(package):
+    with zipfile.ZipFile(package) as f:
+        data = f.read('collection.anki2')
+    with tempfile.NamedTemporaryFile(suffix='.anki2', delete=False) as f:
+        f.write(data)
+    try:
+        connection = sqlite3.connect(f.name)
+        notes = connection.execute('SELECT guid FROM notes').fetchall()
+        connection.close()
+    finally:
+        os.remove(f.name)
+    return [guid for guid, in notes]
+
+
+@pytest.mark.parametrize('bulk', [False, True])
+def test_combined_volumes_keep_their_notes_apart(tmp_path, bulk):
+    output = tmp_path / 'combined.apkg'
+    volumes = {
+        'B1+B2': [Pair('1', None, 'en hund', 'a dog'), Pair('1', None, 'en katt', 'a cat'),
+                  Pair('1', 'Text 1A', 'en hund', 'a dog')],
+        'B2+C1': [Pair('1', None, 'en hund', 'a dog'), Pair('1', None, 'en katt', 'a cat')],
+    }
+    decks = [build_deck(f'Rivstart::{name}', pairs, name) for name, pairs in volumes.items()]
+
+    changes = write_decks(decks, output, bulk=bulk)
+
+    assert str(changes) == '4 added, 0 changed, 0 removed, 1 duplicates dropped'
+    assert len(set(_notes(output))) == len(_notes(output)) == 4
@@ -0,0 +1,17 @@
+import pytest
+
+from ordkort.process_pdf import _proccess_pdf as process_ordkort
+from ordlista.process_pdf import _proccess_pdf as process_ordlista
+from synthetic_pdf import generate_ordkort, generate_ordlista
+
+
+@pytest.mark.parametrize('generate, process',
+                         [(generate_ordlista, process_ordlista), (generate_ordkort, process_ordkort)])
+def test_fast_extraction_matches_layout(tmp_path, generate, process):
+    file = tmp_path / 'volume.pdf'
+    generate(file, pages=6)
+
+    layout = list(process(file, extraction='layout'))
+
+    assert layout
+    assert list(process(file, extraction='fast')) == layout
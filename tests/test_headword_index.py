@@ -0,0 +1,26 @@
+from headword_index import HeadwordIndex
+from ordkort.process_pdf import Pair
+
+
+def test_duplicates():
+    index = HeadwordIndex()
+    index.add_volume('A', [Pair('1', None, 'en hund', 'a dog'), Pair('2', None, 'En hund', ''),
+                           Pair('2', None, 'en katt', '')])
+    index.add_volume('B', [Pair('1', None, 'en hund', ''), Pair('1', None, 'ett hus', '')])
+
+    assert index.duplicates() == {'A': (2, 1, 1), 'B': (2, 0, 1)}
+    assert index.lookup('hund') == 'a dog'
+
+
+def test_glossed_streams_the_pairs():
+    index = HeadwordIndex()
+    index.add_volume('B', [Pair('1', None, 'ett hus', '')])
+
+    def translated():
+        yield Pair('1', None, 'ett hus', 'a house')
+        raise AssertionError('read past the first pair')
+
+    pairs = index.glossed(translated())
+    assert next(pairs).english == 'a house'
+    assert index.lookup('ett hus') == 'a house'
+    assert index.duplicates() == {'B': (1, 0, 0)}
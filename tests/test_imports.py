@@ -0,0 +1,25 @@
+import pytest
+
+from imports import MODES, run_mode
+from synthetic_pdf import generate_ordkort, generate_ordlista
+
+
+@pytest.fixture(scope='module')
+def directory(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('pdfs')
+    for name in ['ordlista_a1a2.pdf', 'ordlista_b1b2.pdf']:
+        generate_ordlista(directory / name, 2)
+    for name in ['ordkort_b1b2.pdf', 'ordkort_b2c1.pdf']:
+        generate_ordkort(directory / name, 2)
+    return directory
+
+
+@pytest.mark.parametrize('parse_cache', [False, True])
+@pytest.mark.parametrize('script, arguments, forbidden', MODES)
+def test_modes_only_import_what_they_need(directory, script, arguments, forbidden, parse_cache):
+    if parse_cache:
+        # fills the parse cache, only the run hitting it is checked
+        run_mode(script, arguments, directory, parse_cache)
+    modules, _ = run_mode(script, arguments, directory, parse_cache)
+
+    assert [m for m in forbidden if m in modules] == []
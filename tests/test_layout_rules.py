@@ -0,0 +1,93 @@
+import itertools
+
+import pytest
+
+from common import SEPARATOR_EMPTY, SEPARATOR_SPACE, Element, Separator
+from layout_rules import volume_name
+from ordkort import process_pdf as ordkort
+from ordlista import process_pdf as ordlista
+
+
+# the conditions the rule files replaced
+
+
+def _old_is_one_liner(line):
+    return len(line) == 5 and line[4].text.startswith('actress') \
+        or line[0].text.startswith('have you/has (') \
+        or len(line) == 5 and line[0].text == 'nen' \
+        or len(line) == 6 and line[0].text == 'massmediet, massmedier, massmedierna' \
+        or len(line) == 5 and line[0].text == 'na' and line[4].text == 'art museum' \
+        or len(line) == 5 and line[0].text == 'na' and line[4].text.startswith('path,') \
+        or len(line) == 5 and line[0].text == 'stämt' and line[4].text.startswith('conform,') \
+        or len(line) == 5 and line[0].text == 'na' and 'grandmother, step grandmother' in line[4].text
+
+
+def _old_replacement(line):
+    # the Swedish of the first pair the old _final_join put in place of the line
+    if line[0].text.startswith('köra (') and len(line) > 7 and isinstance(line[6], Element) \
+            and line[6].text.startswith('in running, i.e'):
+        return 'köra (kör, körde, kört)'
+    elif line[0].text.startswith('Jag skriver till er f'):
+        return 'Jag skriver till er för att...'
+    elif line[0].text.startswith('jag har alltid varit intresserad'):
+        return 'jag har alltid varit intresserad av...'
+    return None
+
+
+FIRSTS = ['nen', 'na', 'stämt', 'massmediet, massmedier, massmedierna', 'have you/has (x', 'have you', 'köra (kör',
+          'Jag skriver till er f...', 'jag har alltid varit intresserad av', 'hus']
+FOURTHS = ['actress x', 'art museum', 'art museums', 'path, x', 'conform, y', 'my grandmother, step grandmother!',
+           'house']
+
+
+def _lines():
+    for first, count, fourth, separator in itertools.product(FIRSTS, range(1, 10), FOURTHS,
+                                                             [SEPARATOR_SPACE, SEPARATOR_EMPTY]):
+        line = [Element(first, 'a', 1)]
+        for i in range(1, count):
+            if i % 2:
+                line.append(Separator(separator))
+            else:
+                line.append(Element({4: fourth, 6: 'in running, i.e x'}.get(i, f'w{i}'), 'b', 1))
+        yield line
+
+
+def test_continuations_match_the_old_conditions():
+    continuations = ordlista._volume_rules('a1a2')['continuations']
+
+    for line in _lines():
+        assert (continuations.lookup(line) is not None) == _old_is_one_liner(line), line
+
+
+def test_replacements_match_the_old_conditions():
+    replacements = ordlista._volume_rules('a1a2')['replacements']
+
+    for line in _lines():
+        rule = replacements.lookup(line)
+        assert (rule['pairs'][0][0] if rule else None) == _old_replacement(line), line
+
+
+def test_volume_name():
+    assert volume_name('~/books/ordkort_b1b2.pdf') == 'b1b2'
+
+
+@pytest.mark.parametrize('volume, starts, glued', [
+    ('b1b2', {'en aktie', 'allergisk', 'beredd', 'alldeles'}, {'anställningsintervju', 'arbetslivserfarenhet'}),
+    ('b2c1', set(), {'nämnare'}),
+])
+def test_ordkort_rules_only_apply_to_their_volume(volume, starts, glued):
+    rules = ordkort._volume_rules(volume)
+
+    assert set(rules['chapter_starts']) == starts
+    assert set(rules['glued']) == glued
+    assert rules['chapter_remaps'] == {'44': '4', '45': '5', '46': '6'}
+
+
+def test_ordkort_glue_is_per_volume():
+    def clean(volume):
+        elements = [ordkort._Marker(ordkort.MARKER_CHAPTER, '1'), Element('räkna', 'f', 16),
+                    Element('nämnare', 'f', 16)]
+        return [e.text for e in ordkort._clean(elements, ordkort._volume_rules(volume)) if isinstance(e, Element)]
+
+    assert clean('b2c1') == ['räknanämnare']
+    assert clean('b1b2') == ['räkna', 'nämnare']
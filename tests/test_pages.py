@@ -0,0 +1,76 @@
+import pytest
+
+import common
+from common import parse_pages
+from element_cache import ElementCache
+from ordkort import process_pdf as ordkort
+from ordkort.process_pdf import get_pairs as get_ordkort_pairs
+from ordlista.process_pdf import get_pairs as get_ordlista_pairs
+from synthetic_pdf import generate_ordkort, generate_ordlista
+
+
+def _contiguous(part, pairs):
+    return any(pairs[i:i + len(part)] == part for i in range(len(pairs) - len(part) + 1))
+
+
+@pytest.mark.parametrize('spec', ['5-3', '', '0', 'a', '2-', '1,,3'])
+def test_parse_pages_rejects_invalid_ranges(spec):
+    with pytest.raises(ValueError):
+        parse_pages(spec)
+
+
+def test_parse_pages():
+    assert parse_pages('2') == [1]
+    assert parse_pages('4-6, 1') == [0, 3, 4, 5]
+
+
+@pytest.mark.parametrize('spec', ['2', '3-4', '8'])
+def test_ordlista_pages_in_the_middle_of_a_chapter(tmp_path, spec):
+    file = tmp_path / 'ordlista_a1a2.pdf'
+    generate_ordlista(file, pages=8)
+    pairs = get_ordlista_pairs(file)
+
+    part = get_ordlista_pairs(file, pages=parse_pages(spec))
+
+    assert part
+    assert _contiguous(part, pairs)
+
+
+@pytest.mark.parametrize('spec', ['2', '3-4', '8'])
+def test_ordkort_pages_in_the_middle_of_a_chapter(tmp_path, spec):
+    file = tmp_path / 'ordkort_b1b2.pdf'
+    generate_ordkort(file, pages=8)
+    pairs = get_ordkort_pairs(file, translate=False)
+
+    part = get_ordkort_pairs(file, translate=False, pages=parse_pages(spec))
+
+    assert part
+    assert _contiguous(part, pairs)
+
+
+def _ordkort_pairs(file, **options):
+    return get_ordkort_pairs(file, False, **options)
+
+
+@pytest.mark.parametrize('generate, parse',
+                         [(generate_ordlista, get_ordlista_pairs), (generate_ordkort, _ordkort_pairs)])
+def test_pages_past_the_end_leave_one_cache_entry(tmp_path, generate, parse):
+    file = tmp_path / 'volume.pdf'
+    generate(file, pages=6)
+    cache = ElementCache(tmp_path / 'cache')
+
+    assert parse(file, element_cache=cache, pages=parse_pages('50')) == []
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+
+def test_markers_before_reuse_the_whole_document_cache(tmp_path, monkeypatch):
+    file = tmp_path / 'ordkort_b1b2.pdf'
+    generate_ordkort(file, pages=8)
+    cache = ElementCache(tmp_path / 'cache')
+    get_ordkort_pairs(file, False, element_cache=cache)
+    markers = ordkort._markers_before(file, 4, None, 'layout')
+
+    # the PDF isn't parsed again
+    monkeypatch.setattr(common, '_iter_tokenized_pages', None)
+    assert ordkort._markers_before(file, 4, cache, 'layout') == markers
+    assert markers[0] is not None
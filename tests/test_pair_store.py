@@ -0,0 +1,52 @@
+import pytest
+
+from ordkort.process_pdf import Pair as OrdkortPair
+from ordlista.process_pdf import Pair
+from pair_store import PairStore, write_pairs
+
+
+PAIRS = [
+    Pair('1', None, 'hej', None, 'hello'),
+    Pair('1', '8', 'en bil', 'bilen, bilar', 'a car'),
+    Pair(None, None, 'räck upp handen', None, None),
+    Pair('2', '9', 'ö ä å – “citat”', '', '日本語, naïve'),
+]
+
+
+def _round_trip(tmp_path, pair_type, pairs):
+    file = tmp_path / 'deck.pairs'
+    write_pairs(file, pair_type, pairs)
+    return PairStore(file, pair_type)
+
+
+def test_round_trip(tmp_path):
+    with _round_trip(tmp_path, Pair, PAIRS) as store:
+        assert len(store) == len(PAIRS)
+        assert list(store) == PAIRS
+        assert [store[i] for i in range(len(PAIRS))] == PAIRS
+
+
+def test_negative_index(tmp_path):
+    with _round_trip(tmp_path, Pair, PAIRS) as store:
+        assert store[-1] == PAIRS[-1]
+        assert store[-len(PAIRS)] == PAIRS[0]
+        with pytest.raises(IndexError):
+            store[-len(PAIRS) - 1]
+        with pytest.raises(IndexError):
+            store[len(PAIRS)]
+
+
+def test_empty_store(tmp_path):
+    with _round_trip(tmp_path, Pair, []) as store:
+        assert len(store) == 0
+        assert list(store) == []
+        with pytest.raises(IndexError):
+            store[0]
+
+
+def test_other_pair_type_is_rejected(tmp_path):
+    file = tmp_path / 'deck.pairs'
+    write_pairs(file, Pair, PAIRS)
+
+    with pytest.raises(Exception):
+        PairStore(file, OrdkortPair)
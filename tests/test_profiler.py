@@ -0,0 +1,57 @@
+import pytest
+
+from profiler import Profiler
+
+SIZE = 8 * 1024 * 1024
+
+
+@pytest.fixture
+def profiler():
+    profiler = Profiler()
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+
+
+def _allocate():
+    # freed again before the stage ends
+    return len(bytearray(SIZE))
+
+
+def _stages(profiler):
+    return profiler.report()['stages']
+
+
+def test_stage_peak_includes_memory_freed_inside_the_stage(profiler):
+    def generate():
+        for _ in range(3):
+            yield _allocate()
+
+    assert list(profiler.stage('allocating', generate())) == [SIZE] * 3
+    with profiler.measure('small'):
+        bytearray(1024)
+
+    stages = _stages(profiler)
+    assert stages['allocating']['items'] == 3
+    assert stages['allocating']['peak_memory'] >= SIZE
+    assert stages['small']['peak_memory'] < SIZE
+
+
+def test_nested_stages_keep_the_peak_of_the_enclosing_stage(profiler):
+    with profiler.measure('outer'):
+        _allocate()
+        with profiler.measure('inner'):
+            bytearray(1024)
+
+    stages = _stages(profiler)
+    assert stages['outer']['peak_memory'] >= SIZE
+    assert stages['inner']['peak_memory'] < SIZE
+    assert profiler.report()['peak_memory'] >= SIZE
+
+
+def test_items_of_a_measured_block(profiler):
+    with profiler.measure('build', 2):
+        pass
+    profiler.items('build', 5)
+
+    assert _stages(profiler)['build']['items'] == 7
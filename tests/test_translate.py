@@ -0,0 +1,30 @@
+import pytest
+
+from ordkort.backends import DictionaryBackend
+from ordkort.dictionary import DictionaryIndex
+from ordkort.process_pdf import Pair
+from ordkort.translate import TranslationEngine, translate_pairs, translate_stream
+from ordkort.translation_cache import TranslationCache
+
+
+def _stream(pairs, **options):
+    return list(translate_stream(pairs, **options))
+
+
+def _pairs():
+    return [Pair('1', None, 'en hund', ''), Pair('1', None, 'en katt', '')]
+
+
+@pytest.mark.parametrize('translate', [translate_pairs, _stream])
+def test_dictionary_misses_are_not_cached(tmp_path, translate):
+    file = tmp_path / 'dictionary.tsv'
+    file.write_text('en hund\ta dog\n', encoding='utf-8')
+
+    with TranslationCache(tmp_path / 'cache.sqlite') as cache:
+        engine = TranslationEngine(DictionaryBackend(DictionaryIndex(file)), workers=1)
+        assert [p.english for p in translate(_pairs(), cache=cache, engine=engine)] == ['a dog', '']
+
+        file.write_text('en hund\ta dog\nen katt\ta cat\n', encoding='utf-8')
+        engine = TranslationEngine(DictionaryBackend(DictionaryIndex(file)), workers=1)
+        assert [p.english for p in translate(_pairs(), cache=cache, engine=engine)] == ['a dog', 'a cat']
+        assert len(cache) == 0